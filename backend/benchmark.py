@@ -0,0 +1,357 @@
+"""
+Benchmark harness for the achievements API.
+
+Generates a synthetic data set, runs the app in-process through an ASGI test
+client and reports p50/p99 latency, throughput and response size per
+endpoint, plus serialization and compression cost of the largest payloads.
+Results are saved as JSON so runs of different versions can be compared.
+
+  python benchmark.py generate DIR --users 10000 --unlocks-per-user 12
+  python benchmark.py run --users 10000 --requests 500 --output before.json
+  python benchmark.py compare before.json after.json
+
+run uses a temporary copy of the generated data (or --data-dir), so the
+real data files are never touched. The storage backend is the one selected
+by ACHIEVEMENTS_STORAGE, as for the server.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_FILE = os.path.join(BACKEND_DIR, "achievements.json")
+
+ENDPOINTS = ["statistics", "user_statistics", "user_achievements", "update_achievement"]
+
+# Relative change (percent) in p50/p99/throughput reported as a regression by compare
+DEFAULT_THRESHOLD = 10.0
+
+
+def generate_data(data_dir, users, unlocks_per_user, seed=0, catalog_file=CATALOG_FILE):
+    """Write users.json, user_achievements.json and the catalog to data_dir.
+
+    Each user holds a random number of achievements averaging unlocks_per_user
+    (capped by the catalog size); popular achievements are picked more often.
+    Returns (user_count, unlock_count).
+    """
+    rng = random.Random(seed)
+    with open(catalog_file, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    achievement_ids = [a["id"] for a in catalog]
+    # Zipf-like popularity, so the rankings are not all ties
+    weights = [1 / (i + 1) for i in range(len(achievement_ids))]
+
+    os.makedirs(data_dir, exist_ok=True)
+    shutil.copy(catalog_file, os.path.join(data_dir, "achievements.json"))
+
+    start = datetime.now() - timedelta(days=365)
+    user_records = []
+    unlock_records = []
+    for i in range(users):
+        username = f"user{i:06d}"
+        created_at = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        user_records.append({"username": username, "created_at": created_at.isoformat()})
+        count = min(len(achievement_ids), int(rng.expovariate(1 / unlocks_per_user)) if unlocks_per_user else 0)
+        held = set()
+        while len(held) < count:
+            held.add(rng.choices(achievement_ids, weights)[0])
+        for achievement_id in held:
+            unlocked_at = created_at + timedelta(seconds=rng.randrange(max(1, int((datetime.now() - created_at).total_seconds()))))
+            unlock_records.append({
+                "username": username,
+                "achievement_id": achievement_id,
+                "unlocked_at": unlocked_at.isoformat()
+            })
+    # The files list unlocks in unlock order, like the app writes them
+    unlock_records.sort(key=lambda ua: ua["unlocked_at"])
+
+    with open(os.path.join(data_dir, "users.json"), "w", encoding="utf-8") as f:
+        json.dump(user_records, f)
+    with open(os.path.join(data_dir, "user_achievements.json"), "w", encoding="utf-8") as f:
+        json.dump(unlock_records, f)
+    return len(user_records), len(unlock_records)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed, sizes=()):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p90_ms": ms(percentile(latencies, 90)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        # Mean bytes on the wire, after any content encoding
+        "response_bytes": round(sum(sizes) / len(sizes)) if sizes else 0
+    }
+
+
+def make_requests(endpoint, count, usernames, achievement_ids, rng):
+    """(method, path, json body) tuples for one endpoint."""
+    requests = []
+    for _ in range(count):
+        username = rng.choice(usernames)
+        if endpoint == "statistics":
+            requests.append(("GET", "/statistics", None))
+        elif endpoint == "user_statistics":
+            requests.append(("GET", f"/statistics/{username}", None))
+        elif endpoint == "user_achievements":
+            requests.append(("GET", f"/achievements/{username}", None))
+        elif endpoint == "update_achievement":
+            requests.append(("POST", "/admin/update-achievement", {
+                "username": username,
+                "achievement_id": rng.choice(achievement_ids),
+                "unlocked": rng.random() < 0.5
+            }))
+    return requests
+
+
+def run_endpoint(client, requests, concurrency):
+    latencies = []
+    errors = 0
+
+    def send(request):
+        method, path, body = request
+        started = time.perf_counter()
+        response = client.request(method, path, json=body)
+        latency = time.perf_counter() - started
+        size = int(response.headers.get("content-length", len(response.content)))
+        return latency, response.status_code, size
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, requests))
+    else:
+        results = [send(request) for request in requests]
+    elapsed = time.perf_counter() - started
+
+    sizes = []
+    for latency, status_code, size in results:
+        if status_code >= 400:
+            errors += 1
+        latencies.append(latency)
+        sizes.append(size)
+    return summarize(latencies, errors, elapsed, sizes)
+
+
+def measure_serialization(main, repeat):
+    """Encode the /statistics and /achievements payloads with each available encoder."""
+    import caching
+
+    payloads = {
+        "statistics": main.build_statistics(main.statistics_snapshots.current()),
+        "achievements": main.build_all_achievements(main.store.view())
+    }
+    encoders = {
+        "json": lambda content: json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+    }
+    if caching.orjson is not None:
+        encoders["orjson"] = caching.orjson.dumps
+
+    def timed(fn, value):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = fn(value)
+        return result, round((time.perf_counter() - started) / repeat * 1000, 3)
+
+    results = {}
+    for name, payload in payloads.items():
+        body, _ = timed(encoders["json"], payload)
+        compressed, gzip_ms = timed(lambda b: gzip.compress(b, compresslevel=caching.GZIP_LEVEL), body)
+        results[name] = {
+            "bytes": len(body),
+            "gzip_bytes": len(compressed),
+            "gzip_ms": gzip_ms,
+            **{f"{encoder}_ms": timed(fn, payload)[1] for encoder, fn in encoders.items()}
+        }
+        if caching.brotli is not None:
+            compressed, brotli_ms = timed(lambda b: caching.compress(b, "br"), body)
+            results[name].update(brotli_bytes=len(compressed), brotli_ms=brotli_ms)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    work_dir = tempfile.mkdtemp(prefix="achievements-bench-")
+    try:
+        if args.data_dir:
+            for name in os.listdir(args.data_dir):
+                path = os.path.join(args.data_dir, name)
+                if os.path.isfile(path):
+                    shutil.copy(path, work_dir)
+        else:
+            print(f"Generating {args.users} users (~{args.unlocks_per_user} unlocks each)...")
+            generate_data(work_dir, args.users, args.unlocks_per_user, args.seed)
+
+        # The app resolves its data files relative to the working directory
+        os.chdir(work_dir)
+        if os.environ.get("ACHIEVEMENTS_STORAGE", "log").lower() == "sqlite":
+            # Never benchmark against (or import into) a configured real database
+            os.environ["ACHIEVEMENTS_DB"] = os.path.join(work_dir, "achievements.db")
+            from storage import SQLiteStorage
+            SQLiteStorage(os.environ["ACHIEVEMENTS_DB"]).import_json()
+
+        from fastapi.testclient import TestClient
+
+        started = time.perf_counter()
+        import main
+        startup_s = time.perf_counter() - started
+
+        usernames = [username for username in main.store.users if not main.is_admin_user(username)]
+        achievement_ids = [a["id"] for a in main.store.achievements]
+        if not usernames or not achievement_ids:
+            raise SystemExit("The data set needs at least one user and one achievement")
+
+        results = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "revision": git_revision(),
+                "label": args.label,
+                "python": platform.python_version(),
+                "storage": os.environ.get("ACHIEVEMENTS_STORAGE", "log"),
+                "users": len(usernames),
+                "unlocks": main.store.unlock_total,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "concurrency": args.concurrency,
+                "accept_encoding": args.accept_encoding,
+                "fast_json": main.caching.FAST_JSON,
+                "startup_s": round(startup_s, 3)
+            },
+            "endpoints": {},
+            "serialization": measure_serialization(main, args.serialization_repeat)
+        }
+        for name, summary in results["serialization"].items():
+            print(f"{name:20} {summary['bytes']:>10} bytes  gzip {summary['gzip_bytes']:>9} bytes  "
+                  + "  ".join(f"{key} {value:.3f}" for key, value in summary.items() if key.endswith("_ms")))
+
+        rng = random.Random(args.seed)
+        with TestClient(main.app, headers={"Accept-Encoding": args.accept_encoding}) as client:
+            for endpoint in args.endpoints:
+                # Warm-up requests fill caches and are not measured
+                run_endpoint(client, make_requests(endpoint, args.warmup, usernames, achievement_ids, rng), 1)
+                requests = make_requests(endpoint, args.requests, usernames, achievement_ids, rng)
+                summary = run_endpoint(client, requests, args.concurrency)
+                results["endpoints"][endpoint] = summary
+                print(f"{endpoint:20} p50 {summary['p50_ms']:9.3f} ms  p99 {summary['p99_ms']:9.3f} ms  "
+                      f"{summary['throughput_rps']:9.1f} req/s  {summary['response_bytes']:>9} bytes  errors {summary['errors']}")
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+    return results
+
+
+def compare_results(old, new, threshold=DEFAULT_THRESHOLD):
+    """Print per-endpoint changes and return the list of regressions."""
+    regressions = []
+    print(f"{'endpoint':20} {'metric':15} {'old':>10} {'new':>10} {'change':>9}")
+    for endpoint, new_summary in new["endpoints"].items():
+        old_summary = old["endpoints"].get(endpoint)
+        if old_summary is None:
+            continue
+        for metric, higher_is_better in (
+            ("p50_ms", False), ("p99_ms", False), ("throughput_rps", True), ("response_bytes", False)
+        ):
+            if metric not in old_summary or metric not in new_summary:
+                continue
+            before, after = old_summary[metric], new_summary[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            regressed = change < -threshold if higher_is_better else change > threshold
+            if regressed:
+                regressions.append((endpoint, metric, change))
+            print(f"{endpoint:20} {metric:15} {before:10.3f} {after:10.3f} {change:+8.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Benchmark the achievements API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a synthetic data set")
+    generate.add_argument("data_dir")
+    generate.add_argument("--users", type=int, default=1000)
+    generate.add_argument("--unlocks-per-user", type=float, default=10)
+    generate.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="run the benchmark")
+    run.add_argument("--data-dir", help="use this data set instead of generating one")
+    run.add_argument("--users", type=int, default=1000)
+    run.add_argument("--unlocks-per-user", type=float, default=10)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    run.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    run.add_argument("--concurrency", type=int, default=1, help="client threads")
+    run.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    run.add_argument("--accept-encoding", default="gzip",
+                     help="Accept-Encoding sent by the client ('identity' for uncompressed responses)")
+    run.add_argument("--serialization-repeat", type=int, default=5,
+                     help="encodings averaged per payload for the serialization measurements")
+    run.add_argument("--label", help="free-form description stored with the results")
+    run.add_argument("--output", default="benchmark_results.json", help="results file ('' to skip)")
+
+    compare = commands.add_parser("compare", help="compare two results files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="percent change reported as a regression")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        user_count, unlock_count = generate_data(args.data_dir, args.users, args.unlocks_per_user, args.seed)
+        print(f"Wrote {user_count} users and {unlock_count} unlocks to {args.data_dir}")
+    elif args.command == "run":
+        if args.output:
+            args.output = os.path.abspath(args.output)
+        run_benchmark(args)
+    elif args.command == "compare":
+        with open(args.old, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare_results(old, new, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
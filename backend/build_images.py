@@ -0,0 +1,127 @@
+"""
+Build resized, content-hashed variants of the achievement images.
+
+For every image the catalog (achievements.json) references, writes WebP
+and PNG versions at each width to image_variants/, named after their
+content (<name>.<width>.<hash>.<ext>), and image_variants.json mapping each
+image_url to its variants. The backend serves the files with immutable
+cache headers and lists each achievement's variants in the /achievements
+responses (see images.py). Run it again after adding or changing images;
+variants no longer referenced are removed (only files named like variants
+or listed in the previous manifest, so other files in --output are kept).
+
+Needs Pillow (pip install Pillow). From the backend directory:
+  python build_images.py [--widths 64 128 256] [--source ../frontend/public]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from io import BytesIO
+
+from images import MANIFEST_FILE, VARIANTS_DIR, VARIANTS_URL
+from store import load_catalog
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Badges are shown at 64-144 CSS pixels; 256 covers the larger ones on 2x screens
+DEFAULT_WIDTHS = [64, 128, 256]
+WEBP_QUALITY = 80
+
+# <name>.<width>.<hash>.<ext>, as written by build_variants
+VARIANT_NAME = re.compile(r".+\.\d+\.[0-9a-f]{10}\.(webp|png)")
+
+
+def encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        # PNG is only the fallback for browsers without WebP; a 256-colour palette makes it ~4x smaller
+        image.quantize(256, method=Image.Quantize.FASTOCTREE).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def build_variants(source_path, widths, output_dir):
+    """Write the variants of one image, returning {format: [{"width", "height", "url"}]}."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants = {"webp": [], "png": []}
+    with Image.open(source_path) as original:
+        original = original.convert("RGBA")
+        # Never upscale: widths above the original's collapse into one full-size variant
+        sizes = sorted({min(width, original.width) for width in widths})
+        for width in sizes:
+            height = max(1, round(original.height * width / original.width))
+            image = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for fmt in variants:
+                data = encode(image, fmt)
+                name = f"{stem}.{width}.{hashlib.sha256(data).hexdigest()[:10]}.{fmt}"
+                path = os.path.join(output_dir, name)
+                if not os.path.exists(path):
+                    with open(path, "wb") as f:
+                        f.write(data)
+                variants[fmt].append({"width": width, "height": height, "url": f"{VARIANTS_URL}/{name}"})
+    return variants
+
+
+def manifest_files(manifest):
+    """Names of the variant files a manifest references."""
+    return {
+        variant["url"].rsplit("/", 1)[1]
+        for variants in manifest.values() for fmt in variants.values() for variant in fmt
+    }
+
+
+def build(catalog_file, source_root, output_dir, manifest_file, widths):
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        with open(manifest_file, encoding="utf-8") as f:
+            previous = manifest_files(json.load(f))
+    except (OSError, ValueError):
+        previous = set()
+    manifest = {}
+    for achievement in load_catalog(catalog_file):
+        image_url = achievement.get("image_url")
+        if not image_url or image_url in manifest:
+            continue
+        source_path = os.path.join(source_root, image_url.lstrip("/"))
+        if not os.path.exists(source_path):
+            print(f"Skipping {achievement['id']}: {source_path} not found")
+            continue
+        manifest[image_url] = build_variants(source_path, widths, output_dir)
+    referenced = manifest_files(manifest)
+    for name in os.listdir(output_dir):
+        # Only remove what this script wrote: --output may be a directory with other files
+        if name not in referenced and (name in previous or VARIANT_NAME.fullmatch(name)):
+            os.remove(os.path.join(output_dir, name))
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Build resized WebP/PNG variants of the achievement images")
+    parser.add_argument("--catalog", default="achievements.json", help="achievement catalog file")
+    parser.add_argument("--source", default=os.path.join("..", "frontend", "public"),
+                        help="directory image_url paths are relative to")
+    parser.add_argument("--output", default=VARIANTS_DIR, help="directory for the variant files")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="manifest file read by the backend")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS, help="variant widths in pixels")
+    args = parser.parse_args(argv)
+    if Image is None:
+        print("build_images.py needs Pillow: pip install Pillow")
+        sys.exit(1)
+    manifest = build(args.catalog, args.source, args.output, args.manifest, args.widths)
+    files = manifest_files(manifest)
+    size = sum(os.path.getsize(os.path.join(args.output, name)) for name in files)
+    print(f"Built {len(files)} variants of {len(manifest)} images ({size / 1024:.0f} KB) in {args.output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,255 @@
+"""
+Conditional GET support and a cache of serialized response bodies.
+
+Read endpoints are tagged with the data store's version: the ETag changes
+whenever any mutation is applied, so a client revalidating with
+If-None-Match gets an empty 304 until something changes, and the server
+re-serializes each (endpoint, params) response at most once per version.
+Compressed variants are cached alongside, so hot responses are not
+re-compressed for every client. Per-user responses are tagged with the
+user's own version instead (DataStore.user_data_version) and kept in a
+cache of their own, so one user's change leaves the others cached.
+
+Concurrent requests missing the cache for the same response wait for one
+build instead of each building it (single flight), so a burst of requests
+for a changed /statistics costs one build.
+
+Set ACHIEVEMENTS_FAST_JSON=1 to serialize responses with orjson (optional
+dependency); brotli is offered when the brotli package is installed.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from email.utils import format_datetime
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from metrics import RESPONSE_BUILD_SECONDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Distinguishes versions of different server runs, as the version counter restarts at 0;
+# the workers of a multi-worker server share one (see main.py)
+BOOT_ID = os.environ.get("ACHIEVEMENTS_BOOT_ID") or uuid.uuid4().hex[:8]
+
+# Maximum number of serialized responses kept
+RESPONSE_CACHE_SIZE = 1024
+
+# Maximum number of per-user responses kept (up to two per user: plain and compressed)
+USER_RESPONSE_CACHE_SIZE = int(os.environ.get("ACHIEVEMENTS_USER_CACHE_SIZE", "4096"))
+
+# Opt-in orjson serialization, used only when orjson is installed
+FAST_JSON = os.environ.get("ACHIEVEMENTS_FAST_JSON") == "1" and orjson is not None
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get("ACHIEVEMENTS_COMPRESS_MIN_BYTES", "1024"))
+
+# Favours speed over the last few percent of size
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def encode_json(content):
+    """Serialize content as compact UTF-8 JSON, like FastAPI's JSONResponse (or with orjson)."""
+    if FAST_JSON:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with encode_json, for the app's default response class."""
+
+    def render(self, content):
+        return encode_json(content)
+
+
+def accepted_encoding(request):
+    """Best content encoding the client accepts: "br", "gzip" or None."""
+    accepted = request.headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def make_etag(version):
+    return f'"{BOOT_ID}-{version}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as intermediaries may add W/ to the tag
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one in-progress computation.
+
+    Used on the event loop only, so it needs no lock.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        # Computations started, and calls that waited for another call's
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, compute):
+        """Await compute() (a coroutine function), or the call already running for key."""
+        task = self._calls.get(key)
+        if task is None:
+            self.started += 1
+            task = self._calls[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        # A waiter giving up (client disconnected) must not cancel the others' computation
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Marks the exception retrieved even if every waiter has gone
+            task.exception()
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class ResponseCache:
+    """Bounded LRU of serialized bodies keyed by (endpoint, params), each tagged with a version.
+
+    Callers may store any value; cached_json_response stores (content encoding, body).
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Builds of missing entries, shared by concurrent requests (see cached_json_response)
+        self.builds = SingleFlight()
+
+    def get(self, key, version, count=True):
+        """The body cached for key at version, or None; count=False leaves hits and misses alone."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    # Versions only move forward, so a stale entry is never used again
+                    del self._entries[key]
+                self.misses += count
+                return None
+            self._entries.move_to_end(key)
+            self.hits += count
+            return entry[1]
+
+    def put(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Drop every encoding of the response cached for key (see cached_json_response)."""
+        with self._lock:
+            for encoding in (None, "gzip", "br"):
+                self._entries.pop((key, encoding), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "builds": self.builds.started,
+                "coalesced": self.builds.coalesced
+            }
+
+
+async def cached_json_response(request: Request, cache: ResponseCache, key, version, last_modified, build, executor):
+    """Answer a GET from the cache, with ETag/Last-Modified and 304 handling.
+
+    build() is only called when no body for this key and version is cached,
+    and runs with its serialization and compression on the executor (see
+    executor.py); concurrent requests for the same body wait for one build.
+    The version must be read before any data build() uses.
+    """
+    etag = make_etag(version)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        # Let browsers keep the response but revalidate it on every use
+        "Cache-Control": "no-cache",
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    encoding = accepted_encoding(request)
+    entry = cache.get((key, encoding), version)
+    if entry is None:
+        entry = await cache.builds.run(
+            (key, version, encoding),
+            lambda: executor.run(encode_variant, cache, key, version, build, encoding)
+        )
+    content_encoding, body = entry
+    if content_encoding:
+        # GZipMiddleware adds Vary to the large responses it leaves uncompressed
+        headers["Content-Encoding"] = content_encoding
+        headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def encode_variant(cache, key, version, build, encoding):
+    """Build, serialize and compress one cached response variant."""
+    # Keys start with the endpoint name
+    endpoint = key[0]
+    # Not a lookup of its own: the request already counted as a miss
+    plain = cache.get((key, None), version, count=False)
+    if plain is None:
+        with RESPONSE_BUILD_SECONDS.time(endpoint=endpoint, stage="build"):
+            content = build()
+        with RESPONSE_BUILD_SECONDS.time(endpoint=endpoint, stage="serialize"):
+            plain = (None, encode_json(content))
+        cache.put((key, None), version, plain)
+    if encoding is None or len(plain[1]) < COMPRESS_MIN_SIZE:
+        entry = plain
+    else:
+        with RESPONSE_BUILD_SECONDS.time(endpoint=endpoint, stage="compress"):
+            entry = (encoding, compress(plain[1], encoding))
+    cache.put((key, encoding), version, entry)
+    return entry
@@ -0,0 +1,96 @@
+"""
+Live update stream (server-sent events) for unlocks and leaderboard changes.
+
+The data store reports every change as small delta events; the broker fans
+them out to the asyncio queues of connected /events clients. Publishing is
+non-blocking and safe from any thread, so changes publish directly from the
+I/O executor threads the async handlers run writes on (see executor.py) and
+from the store's background sync and catalog threads.
+"""
+
+import asyncio
+import json
+import threading
+
+# Events buffered per client before it is considered too slow and told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Sent instead of the dropped events when a client falls behind
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscriber:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, events):
+        # Runs on the subscriber's event loop
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop the backlog; the client re-fetches everything instead
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait(RESYNC_EVENT)
+                return
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, events):
+        """Send delta events to every subscriber; callable from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, events)
+            except RuntimeError:
+                # The subscriber's loop has been closed
+                self.unsubscribe(subscriber)
+
+
+def format_sse(event):
+    data = json.dumps({k: v for k, v in event.items() if k != "type"}, ensure_ascii=False, separators=(",", ":"))
+    lines = [f"event: {event['type']}"]
+    if "version" in event:
+        lines.append(f"id: {event['version']}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(broker, subscriber):
+    """Yield SSE messages for one subscriber until the client disconnects."""
+    try:
+        # Ask the browser to wait a few seconds before reconnecting
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,94 @@
+"""
+Bounded thread pool for the blocking parts of request handling.
+
+Request handlers are async and answer from memory on the event loop. Work
+that can block - storage writes waiting for fsync, anything taking the store
+lock, building and serializing a large response - is handed to a fixed pool
+of threads with run(). At most max_pending jobs may be queued or running;
+beyond that run() raises Overloaded (sent as 503 with Retry-After), so a
+burst of clients is refused quickly instead of piling up.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+# Threads running blocking work
+IO_WORKERS = int(os.environ.get("ACHIEVEMENTS_IO_WORKERS", "32"))
+
+# Jobs allowed to be queued or running before new ones are refused
+IO_QUEUE_SIZE = int(os.environ.get("ACHIEVEMENTS_IO_QUEUE", "1024"))
+
+
+class Overloaded(Exception):
+    """The executor's queue is full."""
+
+
+class BoundedExecutor:
+    def __init__(self, workers=IO_WORKERS, max_pending=IO_QUEUE_SIZE, job_context=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        # Callable returning a context manager entered around every job (see profiling.py)
+        self.job_context = job_context or nullcontext
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+        self._lock = threading.Lock()
+        # Jobs queued or running, and running only
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        # Total seconds jobs spent waiting for a thread
+        self.queue_wait = 0.0
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool and return its result, or raise Overloaded.
+
+        The job runs in a copy of the caller's context, so context variables
+        set for the request are visible to it.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        submitted = time.perf_counter()
+
+        def job():
+            with self._lock:
+                self.running += 1
+                self.queue_wait += time.perf_counter() - submitted
+            try:
+                with self.job_context():
+                    return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        future = self._pool.submit(contextvars.copy_context().run, job)
+        # Also called if the job is cancelled before it starts
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_queue_wait_ms": round(self.queue_wait / self.completed * 1000, 3) if self.completed else 0.0
+            }
@@ -0,0 +1,44 @@
+"""
+Resized achievement image variants, built by build_images.py.
+
+The manifest maps an achievement's image_url to WebP and PNG variants at
+several widths. Variant file names contain a hash of their content, so the
+files are served with a one-year immutable cache lifetime: a changed image
+gets a new name.
+"""
+
+import json
+
+from fastapi.staticfiles import StaticFiles
+
+VARIANTS_DIR = "image_variants"
+MANIFEST_FILE = "image_variants.json"
+VARIANTS_URL = "/images/variants"
+
+
+class ImageVariants:
+    def __init__(self, manifest_file=MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.load()
+
+    def load(self):
+        """(Re)read the manifest; without one, achievements have no variants."""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def fields(self, achievement):
+        """{"image_variants": {format: [{"width", "height", "url"}]}} for an achievement, or {} if none were built."""
+        variants = self.manifest.get(achievement.get("image_url"))
+        return {"image_variants": variants} if variants else {}
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files with content-hashed names, cached by browsers for a year without revalidation."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -1,12 +1,43 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import json
 import os
-from datetime import datetime
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
 
-app = FastAPI(title="Achievements API", version="1.0.0")
+import caching
+import metrics
+from caching import (
+    COMPRESS_MIN_SIZE, GZIP_LEVEL, USER_RESPONSE_CACHE_SIZE, FastJSONResponse, ResponseCache, cached_json_response
+)
+from events import EventBroker, event_stream
+from executor import BoundedExecutor, Overloaded
+from images import VARIANTS_DIR, VARIANTS_URL, ImageVariants, ImmutableStaticFiles
+from metrics import Counter, Gauge, MetricsMiddleware
+from profiling import Profiler, ProfilingMiddleware
+from snapshots import SnapshotScheduler
+from storage import create_storage
+from store import DataStore
+
+async def sync_with_other_workers():
+    # With storage shared between worker processes, apply the other workers'
+    # changes before handling each request
+    if storage.shared:
+        await io_executor.run(store.refresh_if_stale)
+
+app = FastAPI(
+    title="Achievements API",
+    version="1.0.0",
+    dependencies=[Depends(sync_with_other_workers)],
+    default_response_class=FastJSONResponse
+)
+
+# Compress other large responses; cached reads arrive already compressed and pass through
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL)
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -15,8 +46,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+# Request profiling and slow request reports (see profiling.py)
+profiler = Profiler()
+profiler.start_watchdog()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Outermost, so request timings include compression and CORS handling
+app.add_middleware(MetricsMiddleware)
+
 # Data models
 class User(BaseModel):
     username: str
@@ -38,13 +78,53 @@ class AdminUpdate(BaseModel):
     achievement_id: str
     unlocked: bool
 
+class AdminGrant(BaseModel):
+    achievement_id: str
+    usernames: List[str]
+    unlocked: bool = True
+
+class AdminBulkUpdate(BaseModel):
+    updates: List[AdminUpdate] = []
+    grants: List[AdminGrant] = []
+
+class AchievementDefinition(BaseModel):
+    # Letters, digits, _ and -: every id must be usable as a path segment (/admin/catalog/{achievement_id})
+    id: str = Field(min_length=1, pattern=r"^[A-Za-z0-9_-]+$")
+    name: str
+    description: str
+    image_url: str
+
+class AchievementDefinitionUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+
+class ProfilingOptions(BaseModel):
+    requests: int = Field(10, ge=1, le=1000)
+    path_prefix: Optional[str] = None
+
 # Admin user configuration
 ADMIN_USERNAME = "admin"
 
-# In-memory storage (in production, use a proper database)
-USERS_FILE = "users.json"
+# Achievement catalog file; users and unlocks live in the configured storage backend
 ACHIEVEMENTS_FILE = "achievements.json"
-USER_ACHIEVEMENTS_FILE = "user_achievements.json"
+
+# Storage backend for users and unlocks (see storage.py, ACHIEVEMENTS_STORAGE)
+storage = create_storage()
+
+# Number of server processes started by `python main.py`; more than one needs sqlite storage
+WORKERS = int(os.environ.get("ACHIEVEMENTS_WORKERS", "1"))
+
+# How often (seconds) each worker polls shared storage for other workers' changes
+SYNC_INTERVAL = float(os.environ.get("ACHIEVEMENTS_SYNC_INTERVAL_MS", "250")) / 1000
+
+# The /statistics snapshot is rebuilt once changes have been quiet this long (seconds),
+# and at most this long after the first change it misses; 0 rebuilds it on demand instead
+STATS_DEBOUNCE = float(os.environ.get("ACHIEVEMENTS_STATS_DEBOUNCE_MS", "250")) / 1000
+STATS_MAX_STALENESS = float(os.environ.get("ACHIEVEMENTS_STATS_MAX_STALENESS_MS", "2000")) / 1000
+
+# How often (seconds) achievements.json is checked for edits; 0 turns hot reloading off
+CATALOG_CHECK_INTERVAL = float(os.environ.get("ACHIEVEMENTS_CATALOG_CHECK_MS", "1000")) / 1000
 
 # Initialize default data
 def init_default_data():
@@ -105,108 +185,195 @@ def init_default_data():
         with open(ACHIEVEMENTS_FILE, 'w', encoding='utf-8') as f:
             json.dump(default_achievements, f, indent=2, ensure_ascii=False)
     
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
-    
-    if not os.path.exists(USER_ACHIEVEMENTS_FILE):
-        with open(USER_ACHIEVEMENTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
+    storage.initialize()
 
 # Helper function to check if user is admin
 def is_admin_user(username: str) -> bool:
     return username == ADMIN_USERNAME
 
-# Load data functions
-def load_achievements():
-    try:
-        with open(ACHIEVEMENTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Error details for the checks the store repeats under its lock (DataStore.update_achievements, delete_user)
+MISSING_DETAILS = {
+    "user": "User not found",
+    "achievement": "Achievement not found",
+    "last_user": "Cannot delete the last normal user in the system"
+}
 
-def load_users():
-    try:
-        with open(USERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Initialize data on startup
+init_default_data()
 
-def load_user_achievements():
-    try:
-        with open(USER_ACHIEVEMENTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+# Indexed in-memory view of the catalog, users and unlocks (see store.py)
+store = DataStore(storage, ACHIEVEMENTS_FILE, ADMIN_USERNAME)
+if storage.shared:
+    store.start_sync_thread(SYNC_INTERVAL)
+if CATALOG_CHECK_INTERVAL:
+    store.start_catalog_watcher(CATALOG_CHECK_INTERVAL)
 
-def save_users(users):
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, indent=2, ensure_ascii=False)
+# Resized achievement images from build_images.py (none until it has been run),
+# served with immutable cache headers
+image_variants = ImageVariants()
+os.makedirs(VARIANTS_DIR, exist_ok=True)
+app.mount(VARIANTS_URL, ImmutableStaticFiles(directory=VARIANTS_DIR, check_dir=False), name="image_variants")
 
-def save_user_achievements(user_achievements):
-    with open(USER_ACHIEVEMENTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(user_achievements, f, indent=2, ensure_ascii=False)
+def reload_image_variants(deltas):
+    # A catalog reload (or a resync) may reference images built since startup
+    if any(delta["type"] == "resync" for delta in deltas):
+        image_variants.load()
 
-# Initialize data on startup
-init_default_data()
+store.listeners.append(reload_image_variants)
+
+# Serialized read responses, keyed by endpoint and params and tagged with store.version
+response_cache = ResponseCache()
+
+# /achievements/{username} responses, tagged with the user's own version
+user_response_cache = ResponseCache(USER_RESPONSE_CACHE_SIZE)
+
+def invalidate_user_responses(deltas):
+    # Versions already keep stale entries from being served; this frees their space
+    for delta in deltas:
+        if delta["type"] == "resync":
+            user_response_cache.clear()
+        elif delta["type"] == "user_deleted":
+            user_response_cache.discard(("achievements", delta["username"]))
+
+store.listeners.append(invalidate_user_responses)
+
+# Live update stream: every store change is pushed to /events subscribers
+broker = EventBroker()
+store.listeners.append(broker.publish)
+
+# Handlers are async; storage writes, store-lock work and response builds run
+# here, with a bounded queue (see executor.py)
+io_executor = BoundedExecutor(job_context=profiler.worker_thread)
+
+# Everything /statistics shows, rebuilt in the background after changes (see snapshots.py);
+# the recent activity window moves with the date, so a new day needs a new snapshot too
+statistics_snapshots = SnapshotScheduler(
+    "statistics", lambda: build_statistics_snapshot(), STATS_DEBOUNCE, STATS_MAX_STALENESS,
+    expired=lambda snapshot: snapshot.data["date"] != date.today()
+)
+def snapshot_statistics(deltas):
+    # Clients re-fetch right after a resync (catalog change), so don't keep them waiting for the debounce
+    statistics_snapshots.mark_stale(urgent=any(delta["type"] == "resync" for delta in deltas))
+
+store.listeners.append(snapshot_statistics)
+
+# Metrics read from the objects above when /metrics is scraped
+RESPONSE_CACHES = {"responses": response_cache, "user_responses": user_response_cache}
+Counter(
+    "achievements_response_cache_requests_total", "Response cache lookups by cache and result", ["cache", "result"],
+    function=lambda: {
+        key: value
+        for name, cache in RESPONSE_CACHES.items()
+        for key, value in (((name, "hit"), cache.hits), ((name, "miss"), cache.misses))
+    }
+)
+Counter(
+    "achievements_response_builds_total", "Response builds after cache misses, by cache", ["cache"],
+    function=lambda: {(name,): cache.builds.started for name, cache in RESPONSE_CACHES.items()}
+)
+Counter(
+    "achievements_response_builds_coalesced_total", "Requests that waited for a build already running for the same response",
+    ["cache"], function=lambda: {(name,): cache.builds.coalesced for name, cache in RESPONSE_CACHES.items()}
+)
+Gauge(
+    "achievements_response_cache_entries", "Responses held by each response cache", ["cache"],
+    function=lambda: {(name,): cache.stats()["entries"] for name, cache in RESPONSE_CACHES.items()}
+)
+Gauge(
+    "achievements_io_executor_jobs", "I/O executor jobs by state", ["state"],
+    function=lambda: {(state,): io_executor.stats()[state] for state in ("running", "queued")}
+)
+Counter(
+    "achievements_io_executor_rejected_total", "I/O executor jobs refused with 503",
+    function=lambda: io_executor.rejected
+)
+Gauge("achievements_event_subscribers", "Open live update streams", function=lambda: broker.subscriber_count())
+Gauge("achievements_users", "Registered users, excluding the admin", function=lambda: store.normal_user_count())
+Gauge("achievements_unlocks", "Unlocks held by users, excluding the admin", function=lambda: store.view().normal_unlock_total)
+Gauge("achievements_data_version", "Version of the data in this process", function=lambda: store.data_version()[0])
+Counter(
+    "achievements_snapshot_rebuilds_total", "Rebuilds of the materialized /statistics snapshot",
+    function=lambda: statistics_snapshots.rebuilds
+)
+Gauge(
+    "achievements_snapshot_age_seconds", "Age of the /statistics snapshot being served",
+    function=lambda: (datetime.now(timezone.utc) - statistics_snapshots.current().generated_at).total_seconds()
+)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Achievements API is running"}
 
 @app.post("/login")
-def login(user: User):
+async def login(user: User):
     """Simple login - just track the username"""
-    users = load_users()
-    
-    # Check if user exists, if not add them (except for admin user)
-    if not is_admin_user(user.username) and user.username not in [u["username"] for u in users]:
-        users.append({"username": user.username, "created_at": datetime.now().isoformat()})
-        save_users(users)
+    # Check if user exists, if not add them (except for admin user); the check is a
+    # dict lookup and adding one appends a single storage event
+    created = False
+    if not is_admin_user(user.username) and not store.has_user(user.username):
+        created = await io_executor.run(store.add_user, user.username, datetime.now().isoformat())
     
     return {
         "message": f"Welcome {user.username}!", 
         "username": user.username,
-        "is_admin": is_admin_user(user.username)
+        "is_admin": is_admin_user(user.username),
+        "created": created
     }
 
 @app.get("/achievements/{username}")
-def get_user_achievements(username: str):
+async def get_user_achievements(username: str, request: Request):
     """Get all achievements with unlock status for a specific user"""
     # Admin users cannot get achievements
     if is_admin_user(username):
         raise HTTPException(status_code=403, detail="Admin users cannot access achievements")
     
-    achievements = load_achievements()
-    user_achievements = load_user_achievements()
-    
-    # Get unlocked achievement IDs for this user
-    unlocked_ids = [ua["achievement_id"] for ua in user_achievements if ua["username"] == username]
-    
-    # Add unlock status to each achievement
-    for achievement in achievements:
-        achievement["unlocked"] = achievement["id"] in unlocked_ids
+    # Only changes to this user or the catalog invalidate it
+    version, modified_at = store.user_data_version(username)
+    return await cached_json_response(
+        request, user_response_cache, ("achievements", username), version, modified_at,
+        lambda: build_user_achievements(username), io_executor
+    )
+
+def build_user_achievements(username):
+    # Add unlock status to a copy of each achievement
+    achievements = [
+        {**achievement, **image_variants.fields(achievement), "unlocked": unlocked}
+        for achievement, unlocked in store.user_achievement_status(username)
+    ]
     
     return {"achievements": achievements, "username": username}
 
 @app.get("/achievements")
-def get_all_achievements():
+async def get_all_achievements(request: Request):
     """Get all available achievements with statistics"""
-    achievements = load_achievements()
-    user_achievements = load_user_achievements()
-    users = load_users()
-    
+    # One view, so the response is exactly the data its version tags
+    view = store.view()
+    return await cached_json_response(
+        request, response_cache, ("achievements",), view.version, view.modified_at,
+        lambda: build_all_achievements(view), io_executor
+    )
+
+def build_all_achievements(view):
     # Calculate statistics for each achievement
-    total_users = len([u for u in users if not is_admin_user(u["username"])])
+    total_users = view.normal_user_count()
     
     achievements_with_stats = []
-    for achievement in achievements:
+    for achievement in view.achievements:
         # Count how many users have unlocked this achievement
-        unlock_count = sum(1 for ua in user_achievements if ua["achievement_id"] == achievement["id"])
+        unlock_count = view.unlock_count(achievement["id"])
         popularity_percentage = round((unlock_count / total_users * 100) if total_users > 0 else 0, 1)
         
         achievements_with_stats.append({
             **achievement,
+            **image_variants.fields(achievement),
             "unlock_count": unlock_count,
             "popularity_percentage": popularity_percentage
         })
@@ -214,7 +381,7 @@ def get_all_achievements():
     return {"achievements": achievements_with_stats}
 
 @app.post("/admin/update-achievement")
-def update_user_achievement(update: AdminUpdate):
+async def update_user_achievement(update: AdminUpdate):
     """Admin endpoint to update user achievement status"""
     # Check if the user making the request is admin
     # In a real app, you'd check for admin authentication here
@@ -224,44 +391,21 @@ def update_user_achievement(update: AdminUpdate):
     if is_admin_user(update.username):
         raise HTTPException(status_code=403, detail="Cannot assign achievements to admin user")
     
-    achievements = load_achievements()
-    user_achievements = load_user_achievements()
-    
     # Check if achievement exists
-    achievement_exists = any(a["id"] == update.achievement_id for a in achievements)
-    if not achievement_exists:
+    if not store.has_achievement(update.achievement_id):
         raise HTTPException(status_code=404, detail="Achievement not found")
     
     # Check if user exists
-    users = load_users()
-    user_exists = any(u["username"] == update.username for u in users)
-    if not user_exists:
+    if not store.has_user(update.username):
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Update or add user achievement
-    existing_index = None
-    for i, ua in enumerate(user_achievements):
-        if ua["username"] == update.username and ua["achievement_id"] == update.achievement_id:
-            existing_index = i
-            break
-    
+    # Unlock (or refresh the unlock time) or lock the achievement; the store checks again under its lock
     if update.unlocked:
-        if existing_index is not None:
-            # Update existing
-            user_achievements[existing_index]["unlocked_at"] = datetime.now().isoformat()
-        else:
-            # Add new
-            user_achievements.append({
-                "username": update.username,
-                "achievement_id": update.achievement_id,
-                "unlocked_at": datetime.now().isoformat()
-            })
+        missing = await io_executor.run(store.unlock, update.username, update.achievement_id, datetime.now().isoformat())
     else:
-        # Remove achievement if exists
-        if existing_index is not None:
-            user_achievements.pop(existing_index)
-    
-    save_user_achievements(user_achievements)
+        missing = await io_executor.run(store.lock_achievement, update.username, update.achievement_id)
+    if missing:
+        raise HTTPException(status_code=404, detail=MISSING_DETAILS[missing])
     
     return {
         "message": f"Achievement {update.achievement_id} {'unlocked' if update.unlocked else 'locked'} for user {update.username}",
@@ -270,78 +414,290 @@ def update_user_achievement(update: AdminUpdate):
         "unlocked": update.unlocked
     }
 
+@app.post("/admin/bulk-update-achievements")
+async def bulk_update_user_achievements(bulk: AdminBulkUpdate):
+    """Admin endpoint to update many user achievements in one request
+    
+    Accepts individual updates and/or grants of one achievement to many users.
+    Valid items are applied together with a single storage write; invalid items
+    are skipped and reported in the per-item results.
+    """
+    items = list(bulk.updates)
+    for grant in bulk.grants:
+        items.extend(
+            AdminUpdate(username=username, achievement_id=grant.achievement_id, unlocked=grant.unlocked)
+            for username in grant.usernames
+        )
+    
+    results = []
+    valid_updates = []
+    for item in items:
+        # Same checks as /admin/update-achievement, against the in-memory indexes
+        if is_admin_user(item.username):
+            status_code, detail = 403, "Cannot assign achievements to admin user"
+        elif not store.has_achievement(item.achievement_id):
+            status_code, detail = 404, "Achievement not found"
+        elif not store.has_user(item.username):
+            status_code, detail = 404, "User not found"
+        else:
+            status_code, detail = 200, f"Achievement {item.achievement_id} {'unlocked' if item.unlocked else 'locked'} for user {item.username}"
+            valid_updates.append((item.username, item.achievement_id, item.unlocked))
+        results.append({
+            "username": item.username,
+            "achievement_id": item.achievement_id,
+            "unlocked": item.unlocked,
+            "status_code": status_code,
+            "detail": detail
+        })
+    
+    # The store checks again under its lock: a user deleted meanwhile fails there
+    valid_results = [result for result in results if result["status_code"] == 200]
+    missing = await io_executor.run(store.update_achievements, valid_updates, datetime.now().isoformat())
+    for result, missing_item in zip(valid_results, missing):
+        if missing_item:
+            result["status_code"], result["detail"] = 404, MISSING_DETAILS[missing_item]
+    applied = len(valid_updates) - sum(1 for missing_item in missing if missing_item)
+    
+    return {
+        "message": f"Applied {applied} of {len(items)} achievement updates",
+        "applied": applied,
+        "failed": len(items) - applied,
+        "results": results
+    }
+
 @app.get("/users")
-def get_all_users():
-    """Get all users (admin endpoint)"""
-    users = load_users()
-    # Filter out admin user from the list
-    normal_users = [user for user in users if not is_admin_user(user["username"])]
-    return {"users": normal_users}
+async def get_all_users(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+    prefix: Optional[str] = None,
+    ignore_case: bool = False
+):
+    """Get all users (admin endpoint)
+    
+    Paginate with offset/limit; prefix returns only usernames starting with it, in name order
+    (ignore_case=true matches the prefix regardless of case).
+    """
+    # Admin user is filtered out of the list
+    users, total = await io_executor.run(store.users_page, offset, limit, prefix, ignore_case)
+    return {"users": users, "total": total, "offset": offset, "limit": limit}
+
+@app.get("/users/{username}")
+async def get_user(username: str):
+    """Look up one user by name; 404 if they are not registered"""
+    view = store.view()
+    user = view.get_user(username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {
+        **user,
+        "is_admin": is_admin_user(username),
+        "achievements_count": view.user_unlock_count(username)
+    }
 
 @app.delete("/admin/delete-user/{username}")
-def delete_user(username: str):
+async def delete_user(username: str):
     """Admin endpoint to delete a user and all their achievements"""
     # Prevent deleting admin user
     if is_admin_user(username):
         raise HTTPException(status_code=403, detail="Cannot delete admin user")
     
-    users = load_users()
-    user_achievements = load_user_achievements()
-    
     # Check if user exists
-    user_exists = any(u["username"] == username for u in users)
-    if not user_exists:
+    if not store.has_user(username):
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Safety check: prevent deleting the last user
-    normal_users = [u for u in users if not is_admin_user(u["username"])]
-    if len(normal_users) <= 1:
-        raise HTTPException(status_code=400, detail="Cannot delete the last normal user in the system")
-    
-    # Remove user from users list
-    users = [u for u in users if u["username"] != username]
-    save_users(users)
-    
-    # Remove all achievements for this user
-    user_achievements = [ua for ua in user_achievements if ua["username"] != username]
-    save_user_achievements(user_achievements)
+    # Remove user and all achievements for this user; the store repeats the checks under its lock,
+    # including the safety check that prevents deleting the last user
+    missing = await io_executor.run(store.delete_user, username, True)
+    if missing:
+        raise HTTPException(status_code=400 if missing == "last_user" else 404, detail=MISSING_DETAILS[missing])
     
     return {
         "message": f"User {username} and all their achievements have been deleted",
         "deleted_user": username
     }
 
+async def edit_catalog(edit, *args):
+    """Run a DataStore catalog edit on the I/O executor; 400 if achievements.json is not valid JSON."""
+    try:
+        return await io_executor.run(edit, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"achievements.json is not valid JSON: {e}")
+
+@app.post("/admin/catalog")
+async def add_catalog_achievement(achievement: AchievementDefinition):
+    """Admin endpoint to add an achievement to the catalog"""
+    if not await edit_catalog(store.add_catalog_achievement, achievement.model_dump()):
+        raise HTTPException(status_code=409, detail="Achievement already exists")
+    return {"message": f"Achievement {achievement.id} added", "achievement": achievement.model_dump()}
+
+@app.put("/admin/catalog/{achievement_id}")
+async def update_catalog_achievement(achievement_id: str, update: AchievementDefinitionUpdate):
+    """Admin endpoint to change an achievement's name, description or image"""
+    fields = update.model_dump(exclude_none=True)
+    if not await edit_catalog(store.update_catalog_achievement, achievement_id, fields):
+        raise HTTPException(status_code=404, detail="Achievement not found")
+    return {"message": f"Achievement {achievement_id} updated", "achievement": store.view().achievements_by_id.get(achievement_id)}
+
+@app.delete("/admin/catalog/{achievement_id}")
+async def remove_catalog_achievement(achievement_id: str):
+    """Admin endpoint to remove an achievement from the catalog; users' unlocks of it are kept"""
+    if not await edit_catalog(store.remove_catalog_achievement, achievement_id):
+        raise HTTPException(status_code=404, detail="Achievement not found")
+    return {"message": f"Achievement {achievement_id} removed", "removed_achievement": achievement_id}
+
+@app.post("/admin/catalog/reload")
+async def reload_catalog():
+    """Admin endpoint to reload achievements.json now instead of at the next change check"""
+    reloaded = await edit_catalog(store.reload_catalog_if_changed, True)
+    return {"reloaded": reloaded, "achievements": len(store.achievements), "catalog_hash": store.catalog_hash}
+
+@app.get("/admin/matrix")
+async def get_unlock_matrix(request: Request, since: Optional[str] = None):
+    """Admin endpoint: every user's unlocks as bitmaps, or only what changed since an earlier version
+
+    Bit i of a user's hex bitmap is set if they hold achievements[i]. Pass the
+    returned version as since to get only changed and deleted users; the full
+    matrix comes back (full: true) when that is not possible.
+    """
+    version, modified_at = store.data_version()
+    return await cached_json_response(
+        request, response_cache, ("admin_matrix", since), version, modified_at,
+        lambda: build_unlock_matrix(since), io_executor
+    )
+
+def build_unlock_matrix(since):
+    # Versions are only comparable within one server run
+    boot_id, _, since_version = (since or "").partition("-")
+    since_version = int(since_version) if boot_id == caching.BOOT_ID and since_version.isdigit() else None
+    version, full, catalog, masks, deleted = store.unlock_matrix(since_version)
+    matrix = {
+        "version": f"{caching.BOOT_ID}-{version}",
+        "full": full,
+        "unlocks": {username: format(mask, "x") for username, mask in masks.items()},
+        "deleted": deleted
+    }
+    if full:
+        # The catalog is listed once, in bit order
+        matrix["achievements"] = [{**achievement, **image_variants.fields(achievement)} for achievement in catalog]
+    return matrix
+
+@app.get("/admin/io-stats")
+async def get_io_stats():
+    """Backpressure metrics: executor queue, response caches (size and hit ratio) and live update subscribers"""
+    return {
+        "executor": io_executor.stats(),
+        "response_cache": response_cache.stats(),
+        "user_response_cache": user_response_cache.stats(),
+        "statistics_snapshot": statistics_snapshots.stats(),
+        "event_subscribers": broker.subscriber_count()
+    }
+
+@app.get("/admin/profiling")
+async def get_profiling_status():
+    """Profiling session progress and the latest slow request reports"""
+    return profiler.status()
+
+@app.post("/admin/profiling")
+async def start_profiling(options: ProfilingOptions):
+    """Profile the next N requests, optionally only paths starting with path_prefix"""
+    profiler.start(options.requests, options.path_prefix)
+    return profiler.status()
+
+@app.delete("/admin/profiling")
+async def stop_profiling():
+    """Stop profiling new requests; the results so far can still be downloaded"""
+    profiler.stop()
+    return profiler.status()
+
+@app.get("/admin/profiling/pstats")
+async def download_profile_pstats():
+    """cProfile results of the profiled requests, for python -m pstats or snakeviz"""
+    data = await io_executor.run(profiler.pstats_data)
+    if data is None:
+        raise HTTPException(status_code=404, detail="No profiled requests have finished yet")
+    return Response(
+        data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="achievements.pstats"'}
+    )
+
+@app.get("/admin/profiling/collapsed")
+async def download_profile_stacks():
+    """Sampled stacks of the profiled requests in collapsed format, for flamegraph.pl or speedscope"""
+    data = profiler.collapsed_stacks()
+    if data is None:
+        raise HTTPException(status_code=404, detail="No stack samples recorded yet")
+    return Response(
+        data,
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="achievements.collapsed"'}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics of this server process"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/events")
+async def stream_events():
+    """Server-sent events with deltas for unlocks, locks, user changes and rank changes"""
+    subscriber = broker.subscribe()
+    return StreamingResponse(
+        event_stream(broker, subscriber),
+        media_type="text/event-stream",
+        # identity: GZipMiddleware passes the stream through (older Starlette would buffer events in gzip)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"}
+    )
+
 @app.get("/statistics")
-def get_statistics():
-    """Get comprehensive statistics about achievements and users"""
-    users = load_users()
-    achievements = load_achievements()
-    user_achievements = load_user_achievements()
-    
-    # Filter out admin user from statistics
-    normal_users = [user for user in users if not is_admin_user(user["username"])]
-    
-    # Calculate user statistics (excluding admin)
-    user_stats = []
-    for user in normal_users:
-        user_achievement_count = len([ua for ua in user_achievements if ua["username"] == user["username"]])
-        user_stats.append({
-            "username": user["username"],
-            "achievements_count": user_achievement_count,
-            "total_achievements": len(achievements),
-            "completion_percentage": round((user_achievement_count / len(achievements)) * 100, 2) if len(achievements) > 0 else 0
-        })
-    
-    # Sort users by achievement count (descending)
-    user_stats.sort(key=lambda x: x["achievements_count"], reverse=True)
-    
-    # Calculate achievement popularity (excluding admin achievements)
+async def get_statistics(
+    request: Request,
+    rankings_offset: int = Query(0, ge=0),
+    rankings_limit: Optional[int] = Query(None, ge=0),
+    prefix: Optional[str] = None,
+    activity_offset: int = Query(0, ge=0),
+    activity_limit: Optional[int] = Query(None, ge=0)
+):
+    """Get comprehensive statistics about achievements and users
+    
+    user_rankings can be paginated (rankings_offset/rankings_limit, so rankings_limit=N
+    gives the top N) and filtered by username prefix; recent_activity can be paginated
+    with activity_offset/activity_limit. Served from the latest statistics snapshot,
+    which generated_at dates.
+    """
+    if statistics_snapshots.needs_rebuild():
+        await io_executor.run(statistics_snapshots.rebuild_if_stale)
+    snapshot = statistics_snapshots.current()
+    data = snapshot.data
+    # The 30-day recent activity window moves with the date, so the tag does too
+    version = f"{data['version']}-{data['date'].isoformat()}"
+    params = (rankings_offset, rankings_limit, prefix, activity_offset, activity_limit)
+    return await cached_json_response(
+        request, response_cache, ("statistics", params), version, data["modified_at"],
+        lambda: build_statistics(snapshot, *params), io_executor
+    )
+
+def build_statistics_snapshot():
+    # Read in one pass under the store lock, so every part reflects the same version
+    with store.lock:
+        version, modified_at = store.data_version()
+        achievements = store.achievements
+        achievements_by_id = store.achievements_by_id
+        # User statistics (excluding admin), already ranked by achievement count (descending)
+        rankings, _ = store.ranked_user_counts()
+        ranked_achievements = store.ranked_achievement_counts()
+        total_users = store.normal_user_count()
+        total_unlocks = store.normal_unlock_total
+        # Recent activity (achievements unlocked in the last 30 days, excluding admin), from the time index
+        today = date.today()
+        thirty_days_ago = datetime.now() - timedelta(days=30)
+        recent_unlocks = store.recent_unlocks(thirty_days_ago)
+    
+    # Achievement popularity (excluding admin), already ranked by unlock count (descending)
     achievement_popularity = []
-    for achievement in achievements:
-        # Count unlocks excluding admin user
-        unlock_count = len([ua for ua in user_achievements 
-                          if ua["achievement_id"] == achievement["id"] and not is_admin_user(ua["username"])])
-        popularity_percentage = round((unlock_count / len(normal_users)) * 100, 2) if len(normal_users) > 0 else 0
+    for achievement_id, unlock_count in ranked_achievements:
+        achievement = achievements_by_id[achievement_id]
+        popularity_percentage = round((unlock_count / total_users) * 100, 2) if total_users > 0 else 0
         achievement_popularity.append({
             "id": achievement["id"],
             "name": achievement["name"],
@@ -351,28 +707,14 @@ def get_statistics():
             "popularity_percentage": popularity_percentage
         })
     
-    # Sort achievements by popularity (descending)
-    achievement_popularity.sort(key=lambda x: x["unlock_count"], reverse=True)
-    
     # Calculate overall statistics (excluding admin)
-    total_users = len(normal_users)
     total_achievements = len(achievements)
-    # Filter out admin achievements from total unlocks
-    normal_user_achievements = [ua for ua in user_achievements if not is_admin_user(ua["username"])]
-    total_unlocks = len(normal_user_achievements)
     average_achievements_per_user = round(total_unlocks / total_users, 2) if total_users > 0 else 0
-    most_popular_achievement = achievement_popularity[0] if achievement_popularity else None
-    least_popular_achievement = achievement_popularity[-1] if achievement_popularity else None
-    
-    # Calculate recent activity (achievements unlocked in the last 30 days, excluding admin)
-    from datetime import datetime, timedelta
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_unlocks = [
-        ua for ua in normal_user_achievements 
-        if datetime.fromisoformat(ua["unlocked_at"]) > thirty_days_ago
-    ]
     
     return {
+        "version": version,
+        "modified_at": modified_at,
+        "date": today,
         "overall_stats": {
             "total_users": total_users,
             "total_achievements": total_achievements,
@@ -380,50 +722,138 @@ def get_statistics():
             "average_achievements_per_user": average_achievements_per_user,
             "recent_unlocks_count": len(recent_unlocks)
         },
-        "user_rankings": user_stats,
+        # (username, achievements_count, rank) tuples; response pages are formatted from them
+        "user_rankings": rankings,
+        # (username, position in user_rankings), in name order, for prefix filtering
+        "rankings_by_name": sorted((username, position) for position, (username, _, _) in enumerate(rankings)),
         "achievement_popularity": achievement_popularity,
-        "most_popular_achievement": most_popular_achievement,
-        "least_popular_achievement": least_popular_achievement,
+        "most_popular_achievement": achievement_popularity[0] if achievement_popularity else None,
+        "least_popular_achievement": achievement_popularity[-1] if achievement_popularity else None,
         "recent_activity": recent_unlocks
     }
 
+def build_statistics(snapshot, rankings_offset=0, rankings_limit=None, prefix=None, activity_offset=0, activity_limit=None):
+    data = snapshot.data
+    total_achievements = data["overall_stats"]["total_achievements"]
+    
+    ranked_users = data["user_rankings"]
+    if prefix:
+        # Users whose name starts with prefix, still in ranking order (ranks stay overall ranks)
+        by_name = data["rankings_by_name"]
+        start = bisect_left(by_name, (prefix,))
+        end = bisect_left(by_name, (prefix + "\U0010ffff",))
+        ranked_users = [ranked_users[position] for position in sorted(position for _, position in by_name[start:end])]
+    rankings_stop = None if rankings_limit is None else rankings_offset + rankings_limit
+    user_stats = []
+    for username, user_achievement_count, rank in ranked_users[rankings_offset:rankings_stop]:
+        user_stats.append({
+            "username": username,
+            "rank": rank,
+            "achievements_count": user_achievement_count,
+            "total_achievements": total_achievements,
+            "completion_percentage": round((user_achievement_count / total_achievements) * 100, 2) if total_achievements > 0 else 0
+        })
+    
+    recent_unlocks = data["recent_activity"]
+    activity_stop = None if activity_limit is None else activity_offset + activity_limit
+    
+    return {
+        "overall_stats": data["overall_stats"],
+        "user_rankings": user_stats,
+        "achievement_popularity": data["achievement_popularity"],
+        "most_popular_achievement": data["most_popular_achievement"],
+        "least_popular_achievement": data["least_popular_achievement"],
+        "recent_activity": recent_unlocks[activity_offset:activity_stop],
+        "pagination": {
+            "user_rankings": {"offset": rankings_offset, "limit": rankings_limit, "total": len(ranked_users)},
+            "recent_activity": {"offset": activity_offset, "limit": activity_limit, "total": len(recent_unlocks)}
+        },
+        "generated_at": snapshot.generated_at.isoformat()
+    }
+
+# First snapshot now; later ones are rebuilt in the background
+statistics_snapshots.start()
+
+@app.get("/activity")
+async def get_activity(
+    request: Request,
+    days: int = Query(30, ge=1, le=3660),
+    interval: str = Query("day", pattern="^(day|week)$"),
+    achievement_id: Optional[str] = None
+):
+    """Unlocks per day or week (optionally of one achievement) over the last `days` days"""
+    if achievement_id is not None and not store.has_achievement(achievement_id):
+        raise HTTPException(status_code=404, detail="Achievement not found")
+    
+    version, modified_at = store.data_version()
+    # The window ends today, so the tag moves with the date
+    version = f"{version}-{date.today().isoformat()}"
+    params = (days, interval, achievement_id)
+    return await cached_json_response(
+        request, response_cache, ("activity", params), version, modified_at,
+        lambda: build_activity(*params), io_executor
+    )
+
+def build_activity(days, interval, achievement_id):
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    daily_counts = store.daily_unlock_counts(start, end)
+    
+    # One entry per period, including empty ones; weeks start on Monday
+    periods = {}
+    day = start
+    while day <= end:
+        period = day - timedelta(days=day.weekday()) if interval == "week" else day
+        counts = periods.setdefault(period, {})
+        for unlocked_id, count in daily_counts.get(day, {}).items():
+            if achievement_id is None or unlocked_id == achievement_id:
+                counts[unlocked_id] = counts.get(unlocked_id, 0) + count
+        day += timedelta(days=1)
+    
+    series = [
+        {"period_start": period.isoformat(), "unlocks": sum(counts.values()), "by_achievement": counts}
+        for period, counts in periods.items()
+    ]
+    return {
+        "interval": interval,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "achievement_id": achievement_id,
+        "total_unlocks": sum(entry["unlocks"] for entry in series),
+        "series": series
+    }
+
 @app.get("/statistics/{username}")
-def get_user_statistics(username: str):
+async def get_user_statistics(username: str, request: Request):
     """Get detailed statistics for a specific user"""
     # Admin users cannot get personal statistics
     if is_admin_user(username):
         raise HTTPException(status_code=403, detail="Admin users cannot access personal statistics")
     
-    users = load_users()
-    achievements = load_achievements()
-    user_achievements = load_user_achievements()
+    view = store.view()
     
     # Check if user exists
-    user_exists = any(u["username"] == username for u in users)
-    if not user_exists:
+    if not view.has_user(username):
         raise HTTPException(status_code=404, detail="User not found")
     
+    return await cached_json_response(
+        request, response_cache, ("statistics", username), view.version, view.modified_at,
+        lambda: build_user_statistics(view, username), io_executor
+    )
+
+def build_user_statistics(view, username):
+    achievements = view.achievements
+    
     # Get user's achievements
-    user_achievement_list = [ua for ua in user_achievements if ua["username"] == username]
-    user_achievement_ids = [ua["achievement_id"] for ua in user_achievement_list]
-    
-    # Calculate user's position in rankings (excluding admin)
-    normal_users = [user for user in users if not is_admin_user(user["username"])]
-    all_user_stats = []
-    for user in normal_users:
-        user_achievement_count = len([ua for ua in user_achievements if ua["username"] == user["username"]])
-        all_user_stats.append({
-            "username": user["username"],
-            "achievements_count": user_achievement_count
-        })
+    user_achievement_list = view.user_unlocks(username)
     
-    all_user_stats.sort(key=lambda x: x["achievements_count"], reverse=True)
-    user_rank = next((i + 1 for i, stat in enumerate(all_user_stats) if stat["username"] == username), 0)
+    # User's position in rankings (excluding admin)
+    user_rank = view.user_rank(username)
     
     # Get user's achievement details
     user_achievement_details = []
     for ua in user_achievement_list:
-        achievement = next((a for a in achievements if a["id"] == ua["achievement_id"]), None)
+        achievement = view.achievements_by_id.get(ua["achievement_id"])
         if achievement:
             user_achievement_details.append({
                 "id": achievement["id"],
@@ -442,10 +872,17 @@ def get_user_statistics(username: str):
         "total_achievements": len(achievements),
         "completion_percentage": completion_percentage,
         "rank": user_rank,
-        "total_users": len(normal_users),
+        "total_users": view.normal_user_count(),
         "achievements": user_achievement_details
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    if WORKERS > 1:
+        if not storage.shared:
+            raise SystemExit("ACHIEVEMENTS_WORKERS > 1 needs ACHIEVEMENTS_STORAGE=sqlite")
+        # Workers share the ETag prefix; their versions are the shared change sequence
+        os.environ["ACHIEVEMENTS_BOOT_ID"] = caching.BOOT_ID
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept per process: with several workers
+(ACHIEVEMENTS_WORKERS) each scrape of /metrics reports the worker that
+answered it. MetricsMiddleware times every request by route; the store,
+the storage helpers and the response cache record into the metrics defined
+at the bottom of this module. Metrics created with a function read their
+value from it at render time instead.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Every metric, in the order they are rendered
+REGISTRY = []
+
+# Seconds; covers both in-memory reads and slow fsyncs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labels=(), function=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        # Called at render time: a number, or {label values tuple: number} with labels
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label names, label values, value) for every series."""
+        if self.function is not None:
+            value = self.function()
+            values = value if self.labelnames else {(): value}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", self.labelnames, key, value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(names, values)} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum
+                series = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the with block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(series) for key, series in self._values.items()}
+        samples = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append(("_bucket", bucket_labels, key + (format_value(bound),), cumulative))
+            samples.append(("_sum", self.labelnames, key, series[-1]))
+            samples.append(("_count", self.labelnames, key, cumulative))
+        return samples
+
+
+def render():
+    """All metrics in the Prometheus text format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing requests by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; templates keep label values bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_DURATION.observe(elapsed, method=scope["method"], route=path)
+            HTTP_REQUESTS.inc(method=scope["method"], route=path, status=status)
+
+
+HTTP_REQUESTS = Counter(
+    "achievements_http_requests_total", "HTTP requests by method, route and status code",
+    ["method", "route", "status"]
+)
+HTTP_DURATION = Histogram(
+    "achievements_http_request_duration_seconds", "Time to answer HTTP requests (live update streams: until they close)",
+    ["method", "route"]
+)
+HTTP_IN_FLIGHT = Gauge("achievements_http_requests_in_flight", "HTTP requests being handled, including open live update streams")
+
+STORAGE_SECONDS = Histogram(
+    "achievements_storage_operation_seconds", "Time spent in storage backend calls", ["backend", "operation"]
+)
+STORAGE_IO_SECONDS = Histogram(
+    "achievements_storage_io_seconds", "Time spent reading, writing and fsyncing data files", ["file", "operation"]
+)
+STORAGE_BYTES = Counter(
+    "achievements_storage_bytes_total", "Bytes read from and written to data files (SQLite: change payloads)",
+    ["file", "direction"]
+)
+
+RESPONSE_BUILD_SECONDS = Histogram(
+    "achievements_response_build_seconds", "Time to build, serialize and compress cached responses",
+    ["endpoint", "stage"]
+)
+SNAPSHOT_BUILD_SECONDS = Histogram(
+    "achievements_snapshot_build_seconds", "Time to rebuild materialized snapshots (see snapshots.py)", ["snapshot"]
+)
@@ -0,0 +1,328 @@
+"""
+Runtime profiling of requests and slow request reports.
+
+An admin can switch profiling on for the next N requests (POST
+/admin/profiling). Profiled requests run under cProfile, both on the event
+loop and on the I/O executor threads doing their work, and a sampler thread
+records the stacks of those threads every ACHIEVEMENTS_PROFILE_SAMPLE_MS.
+The results download as a pstats file (python -m pstats, snakeviz) or as
+collapsed stacks (flamegraph.pl, speedscope).
+
+While a profiled request awaits, other requests run on the event loop and
+show up in its profile too; profile a quiet moment or a single endpoint
+(path prefix) for clean results.
+
+Independently, a watchdog thread logs every request still running after
+ACHIEVEMENTS_SLOW_REQUEST_MS (0 turns it off) with the stacks of the
+threads serving it, and keeps the latest reports for /admin/profiling.
+Live update streams are long-lived by design and never reported.
+"""
+
+import contextvars
+import cProfile
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Requests running longer than this many seconds are logged with a stack summary
+SLOW_REQUEST_THRESHOLD = float(os.environ.get("ACHIEVEMENTS_SLOW_REQUEST_MS", "1000")) / 1000
+
+# Seconds between stack samples of profiled requests
+SAMPLE_INTERVAL = float(os.environ.get("ACHIEVEMENTS_PROFILE_SAMPLE_MS", "5")) / 1000
+
+# Slow request reports kept for the status endpoint
+SLOW_REQUESTS_KEPT = 20
+
+# Innermost frames per thread in a slow request report
+STACK_LIMIT = 25
+
+# Requests to these paths (the profiling endpoints themselves) are never profiled
+PROFILING_PATH = "/admin/profiling"
+
+# The request being handled in this context; copied to executor threads (see executor.py)
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class TrackedRequest:
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.profiled = False
+        self.streaming = False
+        self.reported = False
+        # Executor threads working on the request right now
+        self.threads = set()
+
+    def describe(self):
+        # The router stores the matched route in the scope once it has run
+        route = getattr(self.scope.get("route"), "path", None)
+        return {"method": self.scope["method"], "path": self.scope["path"], "route": route}
+
+
+def frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse_stack(frame):
+    """The frame's stack as "outer;...;inner" frame names."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def summarize_stack(frame):
+    return [
+        f"{entry.filename}:{entry.lineno} in {entry.name}"
+        for entry in traceback.extract_stack(frame, limit=STACK_LIMIT)
+    ]
+
+
+class Profiler:
+    def __init__(self, slow_threshold=SLOW_REQUEST_THRESHOLD, sample_interval=SAMPLE_INTERVAL):
+        self.slow_threshold = slow_threshold
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._requests = set()
+        self._loop_thread = None
+        self.slow_requests = deque(maxlen=SLOW_REQUESTS_KEPT)
+        self._sampler = None
+        self._watchdog = None
+        self._reset(0, None)
+
+    def _reset(self, requests, path_prefix):
+        self.remaining = requests
+        self.path_prefix = path_prefix
+        self.profiled = 0
+        self.started_at = time.time()
+        # Finished cProfile runs of this session, and the one on the event loop
+        self._profiles = []
+        self._loop_profile = None
+        self._loop_requests = 0
+        # Executor threads running profiled work
+        self._profiled_threads = set()
+        self._stacks = Counter()
+        self.samples = 0
+
+    # Profiling sessions
+
+    def start(self, requests, path_prefix=None):
+        """Profile the next requests requests (only paths starting with path_prefix, if given)."""
+        with self._lock:
+            if self._loop_profile is not None:
+                self._loop_profile.disable()
+            self._reset(requests, path_prefix)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+                self._sampler.start()
+
+    def stop(self):
+        """Stop profiling new requests; results so far stay available."""
+        with self._lock:
+            self.remaining = 0
+
+    def status(self):
+        with self._lock:
+            return {
+                "active": bool(self.remaining or self._loop_requests),
+                "remaining_requests": self.remaining,
+                "profiled_requests": self.profiled,
+                "path_prefix": self.path_prefix,
+                "started_at": self.started_at,
+                "stack_samples": self.samples,
+                "slow_request_threshold_ms": round(self.slow_threshold * 1000),
+                "slow_requests": list(self.slow_requests)
+            }
+
+    def pstats_data(self):
+        """Marshalled pstats of the finished profiled requests, or None."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        # The format pstats.Stats.dump_stats writes
+        return marshal.dumps(stats.stats)
+
+    def collapsed_stacks(self):
+        """Sampled stacks with their counts, one "frame;frame;frame count" line each, or None."""
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        if not stacks:
+            return None
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    # Request hooks
+
+    def begin(self, scope):
+        request = TrackedRequest(scope)
+        with self._lock:
+            self._loop_thread = threading.get_ident()
+            self._requests.add(request)
+            if self.remaining and self._wanted(scope["path"]):
+                self.remaining -= 1
+                self.profiled += 1
+                request.profiled = True
+                if self._loop_requests == 0:
+                    self._loop_profile = self._enable_profile()
+                self._loop_requests += 1
+        return request
+
+    def end(self, request):
+        elapsed = time.perf_counter() - request.started
+        with self._lock:
+            self._requests.discard(request)
+            if request.profiled and self._loop_requests:
+                self._loop_requests -= 1
+                if self._loop_requests == 0 and self._loop_profile is not None:
+                    self._loop_profile.disable()
+                    self._profiles.append(self._loop_profile)
+                    self._loop_profile = None
+        if self.slow_threshold and elapsed >= self.slow_threshold and not request.reported and not request.streaming:
+            self._report(request, elapsed, finished=True, stacks=[])
+
+    def _wanted(self, path):
+        if path.startswith(PROFILING_PATH):
+            return False
+        return self.path_prefix is None or path.startswith(self.path_prefix)
+
+    @staticmethod
+    def _enable_profile():
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: one profiler at a time, and it already sees every thread
+            return None
+        return profile
+
+    @contextmanager
+    def worker_thread(self):
+        """Entered around executor jobs: tracks and profiles the thread for the current request."""
+        request = current_request.get()
+        if request is None:
+            yield
+            return
+        thread = threading.get_ident()
+        profile = self._enable_profile() if request.profiled else None
+        with self._lock:
+            request.threads.add(thread)
+            if request.profiled:
+                self._profiled_threads.add(thread)
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                request.threads.discard(thread)
+                self._profiled_threads.discard(thread)
+                if profile is not None:
+                    self._profiles.append(profile)
+
+    # Background threads
+
+    def _sample(self):
+        while True:
+            time.sleep(self.sample_interval)
+            with self._lock:
+                if not (self.remaining or self._loop_requests or self._profiled_threads):
+                    # Session over; start() starts a new sampler
+                    self._sampler = None
+                    return
+                threads = set(self._profiled_threads)
+                if self._loop_requests:
+                    threads.add(self._loop_thread)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            stacks = [collapse_stack(frames[thread]) for thread in threads if thread in frames]
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def start_watchdog(self):
+        """Report slow requests while they are still running."""
+        if self.slow_threshold and self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name="slow-request-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def _watch(self):
+        interval = max(self.slow_threshold / 4, 0.01)
+        while True:
+            time.sleep(interval)
+            now = time.perf_counter()
+            with self._lock:
+                due = [
+                    request for request in self._requests
+                    if not request.reported and not request.streaming and now - request.started >= self.slow_threshold
+                ]
+                threads = {request: request.threads | {self._loop_thread} for request in due}
+            if not due:
+                continue
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for request in due:
+                stacks = [
+                    {"thread": names.get(thread, str(thread)), "stack": summarize_stack(frames[thread])}
+                    for thread in sorted(threads[request], key=str) if thread in frames
+                ]
+                self._report(request, now - request.started, finished=False, stacks=stacks)
+
+    def _report(self, request, elapsed, finished, stacks):
+        request.reported = True
+        report = {
+            **request.describe(),
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "finished": finished,
+            "reported_at": time.time(),
+            "stacks": stacks
+        }
+        self.slow_requests.append(report)
+        lines = [
+            f"Slow request {report['method']} {report['path']}: "
+            f"{'took' if finished else 'running for'} {report['elapsed_ms']} ms"
+        ]
+        for stack in stacks:
+            lines.append(f"  Thread {stack['thread']}:")
+            lines.extend(f"    {line}" for line in stack["stack"])
+        logger.warning("\n".join(lines))
+
+
+class ProfilingMiddleware:
+    """ASGI middleware tracking requests for the profiler and the slow request watchdog."""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = self.profiler.begin(scope)
+        token = current_request.set(request)
+
+        async def send_checking_stream(message):
+            if message["type"] == "http.response.start":
+                content_type = dict(message.get("headers", ())).get(b"content-type", b"")
+                request.streaming = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_checking_stream)
+        finally:
+            current_request.reset(token)
+            self.profiler.end(request)
@@ -0,0 +1,133 @@
+"""
+Materialized views of the store, rebuilt in the background.
+
+A SnapshotScheduler keeps the latest result of an expensive build (the
+overall statistics, see main.py) and rebuilds it on its own thread after
+the data changes, so requests read a finished, immutable snapshot instead
+of computing one. Rebuilds are debounced: a burst of changes (a bulk
+admin update) triggers one rebuild once changes have been quiet for
+`debounce` seconds, but a snapshot never falls more than `max_staleness`
+seconds behind the first change it is missing. With max_staleness 0 there
+is no background thread and readers rebuild a stale snapshot on demand, as
+they also do after an urgent change (one clients re-fetch for at once).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from metrics import SNAPSHOT_BUILD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """One build's result; replaced, never modified."""
+
+    __slots__ = ("generation", "generated_at", "data")
+
+    def __init__(self, generation, generated_at, data):
+        self.generation = generation
+        self.generated_at = generated_at
+        self.data = data
+
+
+class SnapshotScheduler:
+    def __init__(self, name, build, debounce, max_staleness, expired=None):
+        self.name = name
+        # Called on the scheduler thread, returns the snapshot's data
+        self.build = build
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        # Optional predicate: rebuild a snapshot even without changes (say, a new day)
+        self.expired = expired
+        self._snapshot = None
+        self._condition = threading.Condition()
+        # Serializes builds, so a snapshot is never replaced by an older one
+        self._build_lock = threading.RLock()
+        # monotonic() of the first and the latest change not in the snapshot
+        self._stale_since = None
+        self._last_change = None
+        # Set by an urgent change: the next reader rebuilds instead of waiting
+        self._urgent = False
+        self.rebuilds = 0
+        self._thread = None
+
+    def start(self):
+        """Build the first snapshot, then keep it up to date in the background."""
+        self.rebuild()
+        if self.max_staleness and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-snapshot", daemon=True)
+            self._thread.start()
+
+    def current(self):
+        """The latest snapshot; never blocks."""
+        return self._snapshot
+
+    def mark_stale(self, urgent=False):
+        """Note a data change."""
+        with self._condition:
+            if urgent:
+                self._urgent = True
+            now = time.monotonic()
+            if self._stale_since is None:
+                self._stale_since = now
+            self._last_change = now
+            self._condition.notify()
+
+    def needs_rebuild(self):
+        """Whether a reader must rebuild before reading (only without a background thread)."""
+        if self._urgent:
+            return True
+        return self._thread is None and (self._stale_since is not None or self._is_expired())
+
+    def rebuild_if_stale(self):
+        with self._build_lock:
+            if self._urgent or self._stale_since is not None or self._is_expired():
+                self.rebuild()
+
+    def rebuild(self):
+        with self._build_lock:
+            with self._condition:
+                # Changes arriving during the build mark it stale again
+                self._stale_since = self._last_change = None
+                self._urgent = False
+            with SNAPSHOT_BUILD_SECONDS.time(snapshot=self.name):
+                data = self.build()
+            self.rebuilds += 1
+            self._snapshot = Snapshot(self.rebuilds, datetime.now(timezone.utc), data)
+
+    def _is_expired(self):
+        return self.expired is not None and self._snapshot is not None and self.expired(self._snapshot)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Wake up now and then to check expiry
+                while self._stale_since is None and not self._is_expired():
+                    self._condition.wait(self.max_staleness)
+                # Debounce: wait for quiet, but no longer than max_staleness overall
+                while self._stale_since is not None:
+                    due = min(self._last_change + self.debounce, self._stale_since + self.max_staleness)
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception("Rebuilding the %s snapshot failed", self.name)
+                # Try again after max_staleness rather than spinning
+                self.mark_stale()
+                time.sleep(self.max_staleness)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "rebuilds": self.rebuilds,
+            "generated_at": snapshot.generated_at.isoformat() if snapshot else None,
+            "stale": self._stale_since is not None,
+            "debounce_ms": round(self.debounce * 1000),
+            "max_staleness_ms": round(self.max_staleness * 1000)
+        }
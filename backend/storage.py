@@ -0,0 +1,723 @@
+"""
+Storage backends for users and user achievement unlocks.
+
+The achievement catalog itself stays in achievements.json; the backends here
+only hold the data that changes at runtime (users and unlocks).
+
+Select the backend with the ACHIEVEMENTS_STORAGE environment variable:
+  log    - users.json / user_achievements.json snapshots plus an append-only
+           event log, events.jsonl (default)
+  json   - users.json / user_achievements.json rewritten on every change
+  sqlite - a single SQLite database in WAL mode (ACHIEVEMENTS_DB, default achievements.db)
+
+Import existing JSON data into a fresh SQLite database with:
+  python storage.py import-json
+
+Only sqlite can be shared by several server processes (ACHIEVEMENTS_WORKERS);
+the file-based backends lock their data files against a second process.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from metrics import STORAGE_BYTES, STORAGE_IO_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+USERS_FILE = "users.json"
+USER_ACHIEVEMENTS_FILE = "user_achievements.json"
+SQLITE_FILE = "achievements.db"
+EVENT_LOG_FILE = "events.jsonl"
+EVENT_ARCHIVE_FILE = "events.archive.jsonl"
+
+# Writes to the same JSON file arriving within this window are flushed together
+GROUP_COMMIT_WINDOW = float(os.environ.get("ACHIEVEMENTS_COMMIT_WINDOW_MS", "5")) / 1000
+
+# The event log is compacted into a new snapshot once it holds this many events
+COMPACT_EVENTS = int(os.environ.get("ACHIEVEMENTS_COMPACT_EVENTS", "1000"))
+# How often (seconds) the background compactor checks the log size
+COMPACT_INTERVAL = 30
+
+# Data files are written compactly; set ACHIEVEMENTS_PRETTY_JSON=1 for indented, hand-editable files
+JSON_INDENT = 2 if os.environ.get("ACHIEVEMENTS_PRETTY_JSON") == "1" else None
+
+# SQLite keeps this many recent changes for other processes to catch up from
+CHANGE_RETENTION = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def apply_events(users, user_achievements, events):
+    """Apply mutation events to user and unlock lists, returning new lists.
+
+    Events are dicts with a "type" of add_user, delete_user, unlock, lock or
+    catalog. Every event sets the final state of whatever it touches, so
+    applying the same events twice gives the same result as applying them
+    once. A catalog event records a catalog reload and changes no user data.
+    """
+    users_by_name = {u["username"]: u for u in users}
+    unlocks = {(ua["username"], ua["achievement_id"]): ua for ua in user_achievements}
+    for event in events:
+        kind = event["type"]
+        if kind == "add_user":
+            users_by_name.setdefault(event["username"], {"username": event["username"], "created_at": event["created_at"]})
+        elif kind == "delete_user":
+            users_by_name.pop(event["username"], None)
+            unlocks = {key: ua for key, ua in unlocks.items() if key[0] != event["username"]}
+        elif kind == "unlock":
+            # Records are replaced rather than mutated, as other threads may be serializing them;
+            # re-unlocking keeps the unlock's original position
+            unlocks[(event["username"], event["achievement_id"])] = {
+                "username": event["username"],
+                "achievement_id": event["achievement_id"],
+                "unlocked_at": event["unlocked_at"]
+            }
+        elif kind == "lock":
+            unlocks.pop((event["username"], event["achievement_id"]), None)
+        elif kind == "catalog":
+            pass
+        else:
+            raise ValueError(f"Unknown storage event type: {kind}")
+    return list(users_by_name.values()), list(unlocks.values())
+
+
+def write_json_atomic(path, data, indent=JSON_INDENT):
+    """Write JSON to a temp file, fsync it and rename it over path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    with STORAGE_IO_SECONDS.time(file=name, operation="write"):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                # No space after commas when indented: it would end every line with trailing whitespace
+                separators = (",", ": ") if indent else (",", ":")
+                json.dump(data, f, indent=indent, separators=separators, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+                STORAGE_BYTES.inc(os.fstat(f.fileno()).st_size, file=name, direction="write")
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if os.name == "posix":
+            # Make the rename itself durable
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+
+def lock_data_files(path):
+    """Take an exclusive lock on path + ".lock" for the life of the process.
+
+    The file-based backends assume a single writer; a second server process
+    on the same files fails here instead of corrupting them.
+    """
+    lock_file = open(path + ".lock", "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"{path} is in use by another process; "
+                "run several workers with ACHIEVEMENTS_STORAGE=sqlite instead"
+            )
+    return lock_file
+
+
+class GroupCommit:
+    """Coalesces concurrent flushes of one file (group commit).
+
+    Writers record their change under self._cond and take a ticket, then
+    wait() for it to be durable. The first waiter becomes the flusher: it
+    sleeps for the commit window, flushes everything submitted so far in one
+    go and wakes every waiter that flush covered.
+    """
+
+    def __init__(self, path, commit_window=None):
+        self.path = path
+        self.commit_window = GROUP_COMMIT_WINDOW if commit_window is None else commit_window
+        self._cond = threading.Condition()
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._error = None
+        self._flushing = False
+
+    def _take(self):
+        """Called under self._cond: capture what the next flush must write."""
+
+    def _flush(self, payload):
+        raise NotImplementedError
+
+    def wait(self, ticket):
+        """Block until the submission with this ticket (or a later one) is on disk."""
+        with self._cond:
+            while self._flushing and self._written < ticket and self._failed < ticket:
+                self._cond.wait()
+            if self._written >= ticket:
+                return
+            if self._failed >= ticket:
+                raise OSError(f"Failed to write {self.path}") from self._error
+            self._flushing = True
+        try:
+            if self.commit_window:
+                time.sleep(self.commit_window)
+            with self._cond:
+                payload, target = self._take(), self._submitted
+            try:
+                self._flush(payload)
+            except BaseException as e:
+                with self._cond:
+                    self._failed, self._error = target, e
+                raise
+            with self._cond:
+                self._written = target
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._cond.notify_all()
+
+
+class AtomicJSONFile(GroupCommit):
+    """A JSON file replaced atomically; only the latest submitted content is written."""
+
+    def __init__(self, path, commit_window=None):
+        super().__init__(path, commit_window)
+        self._pending = None
+
+    def read(self):
+        name = os.path.basename(self.path)
+        try:
+            with STORAGE_IO_SECONDS.time(file=name, operation="read"), open(self.path, 'r', encoding='utf-8') as f:
+                STORAGE_BYTES.inc(os.fstat(f.fileno()).st_size, file=name, direction="read")
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def submit(self, data):
+        """Queue data as the next content of the file, returning a ticket for wait()."""
+        with self._cond:
+            self._submitted += 1
+            self._pending = data
+            return self._submitted
+
+    def _take(self):
+        data, self._pending = self._pending, None
+        return data
+
+    def _flush(self, data):
+        write_json_atomic(self.path, data)
+
+    def write(self, data):
+        self.wait(self.submit(data))
+
+
+class AppendLog(GroupCommit):
+    """A JSON-lines file that is only appended to; fsyncs are group-committed."""
+
+    def __init__(self, path, commit_window=None):
+        super().__init__(path, commit_window)
+        self._file = None
+
+    def read(self):
+        """All records in the log, ignoring a torn last line left by a crash."""
+        records = []
+        name = os.path.basename(self.path)
+        try:
+            with STORAGE_IO_SECONDS.time(file=name, operation="read"), open(self.path, 'r', encoding='utf-8') as f:
+                STORAGE_BYTES.inc(os.fstat(f.fileno()).st_size, file=name, direction="read")
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def submit(self, records):
+        """Append records (written but not yet fsynced), returning a ticket for wait()."""
+        with self._cond:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            text = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+            self._file.write(text)
+            self._file.flush()
+            STORAGE_BYTES.inc(len(text.encode("utf-8")), file=os.path.basename(self.path), direction="write")
+            self._submitted += 1
+            return self._submitted
+
+    def _take(self):
+        return self._file
+
+    def _flush(self, f):
+        with STORAGE_IO_SECONDS.time(file=os.path.basename(self.path), operation="fsync"):
+            os.fsync(f.fileno())
+
+    def rotate(self, segment_path):
+        """Move the current log to segment_path and start a new, empty log.
+
+        Returns False if there was nothing to move.
+        """
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            self._written = self._submitted
+            if not os.path.exists(self.path):
+                return False
+            os.replace(self.path, segment_path)
+            return True
+
+
+class Storage:
+    """Interface shared by all storage backends."""
+
+    # ACHIEVEMENTS_STORAGE name, used as a metrics label
+    name = "custom"
+
+    # Whether several processes can use the storage at once (see changes_since)
+    shared = False
+
+    def initialize(self):
+        """Create empty storage if it does not exist yet."""
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def load_user_achievements(self, username=None):
+        raise NotImplementedError
+
+    def get_user(self, username):
+        return next((u for u in self.load_users() if u["username"] == username), None)
+
+    def save_users(self, users):
+        raise NotImplementedError
+
+    def save_user_achievements(self, user_achievements):
+        raise NotImplementedError
+
+    def submit(self, events):
+        """Persist mutation events (see apply_events), returning a ticket for wait().
+
+        Callers that need a global order of mutations call submit() under
+        their own lock and wait() outside it, so concurrent writes can be
+        committed together.
+        """
+        raise NotImplementedError
+
+    def wait(self, ticket):
+        """Block until the events behind a submit() ticket are durable."""
+
+    def apply(self, events):
+        self.wait(self.submit(events))
+
+    def change_seq(self):
+        """Sequence number of the latest change, for shared storage."""
+        return 0
+
+    def changes_since(self, seq):
+        """(seq, events) for every change after seq, in commit order, for shared storage.
+
+        events is None where the data was replaced wholesale. Returns None if
+        changes after seq are no longer kept and the data must be reloaded.
+        """
+        return []
+
+
+class JSONStorage(Storage):
+    """Whole-file JSON storage, the original format.
+
+    The file contents are cached after the first read; every mutation
+    rewrites the affected files atomically through AtomicJSONFile.
+    """
+
+    name = "json"
+
+    def __init__(self, users_file=USERS_FILE, user_achievements_file=USER_ACHIEVEMENTS_FILE, commit_window=None):
+        self.users_file = AtomicJSONFile(users_file, commit_window)
+        self.user_achievements_file = AtomicJSONFile(user_achievements_file, commit_window)
+        self._lock = threading.Lock()
+        self._users = None
+        self._user_achievements = None
+        self._process_lock = None
+
+    def initialize(self):
+        if self._process_lock is None:
+            self._process_lock = lock_data_files(self.users_file.path)
+        for f in (self.users_file, self.user_achievements_file):
+            if not os.path.exists(f.path):
+                f.write([])
+
+    def _load(self):
+        if self._users is None:
+            self._users = self.users_file.read()
+            self._user_achievements = self.user_achievements_file.read()
+
+    def load_users(self):
+        with self._lock:
+            self._load()
+            return list(self._users)
+
+    def load_user_achievements(self, username=None):
+        with self._lock:
+            self._load()
+            user_achievements = list(self._user_achievements)
+        if username is not None:
+            user_achievements = [ua for ua in user_achievements if ua["username"] == username]
+        return user_achievements
+
+    def save_users(self, users):
+        with self._lock:
+            self._load()
+            self._users = list(users)
+            ticket = self.users_file.submit(self._users)
+        self.users_file.wait(ticket)
+
+    def save_user_achievements(self, user_achievements):
+        with self._lock:
+            self._load()
+            self._user_achievements = list(user_achievements)
+            ticket = self.user_achievements_file.submit(self._user_achievements)
+        self.user_achievements_file.wait(ticket)
+
+    def submit(self, events):
+        tickets = []
+        with self._lock:
+            self._load()
+            users, user_achievements = apply_events(self._users, self._user_achievements, events)
+            if any(e["type"] in ("add_user", "delete_user") for e in events):
+                self._users = users
+                tickets.append((self.users_file, self.users_file.submit(users)))
+            if any(e["type"] in ("delete_user", "unlock", "lock") for e in events):
+                self._user_achievements = user_achievements
+                tickets.append((self.user_achievements_file, self.user_achievements_file.submit(user_achievements)))
+        return tickets
+
+    def wait(self, ticket):
+        for f, file_ticket in ticket:
+            f.wait(file_ticket)
+
+
+class EventLogStorage(Storage):
+    """JSON snapshots plus an append-only log of mutation events.
+
+    Each mutation appends one JSON line per event to the log, so an update
+    costs O(1) I/O instead of a full-file rewrite. The current state is the
+    snapshot (the same users.json / user_achievements.json files JSONStorage
+    uses) with the log replayed on top.
+
+    A background thread compacts the log once it holds compact_events events:
+    the log is moved aside, folded into new snapshots, and its events are
+    appended to the archive file, which keeps the full audit trail of who
+    got which achievement when. Replaying an event twice is harmless, so a
+    crash part-way through compaction only replays a few events again.
+    """
+
+    name = "log"
+
+    def __init__(self, users_file=USERS_FILE, user_achievements_file=USER_ACHIEVEMENTS_FILE,
+                 log_file=EVENT_LOG_FILE, archive_file=EVENT_ARCHIVE_FILE,
+                 commit_window=None, compact_events=COMPACT_EVENTS):
+        self.users_file = AtomicJSONFile(users_file, 0)
+        self.user_achievements_file = AtomicJSONFile(user_achievements_file, 0)
+        self.log = AppendLog(log_file, commit_window)
+        self.segment_path = log_file + ".compacting"
+        self.archive_path = archive_file
+        self.compact_events = compact_events
+        # Orders appends to the log
+        self._lock = threading.Lock()
+        # Serializes compaction with full loads and saves
+        self._compact_lock = threading.Lock()
+        self._log_events = len(self.log.read())
+        self._wake = threading.Event()
+        self._compactor = None
+        self._process_lock = None
+
+    def initialize(self):
+        if self._process_lock is None:
+            self._process_lock = lock_data_files(self.users_file.path)
+        for f in (self.users_file, self.user_achievements_file):
+            if not os.path.exists(f.path):
+                f.write([])
+        if self.compact_events and self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_loop, name="event-log-compactor", daemon=True)
+            self._compactor.start()
+
+    def _load_state(self):
+        """Snapshot with any half-compacted segment and the log replayed on top."""
+        users = self.users_file.read()
+        user_achievements = self.user_achievements_file.read()
+        for path in (self.segment_path, self.log.path):
+            users, user_achievements = apply_events(users, user_achievements, AppendLog(path).read())
+        return users, user_achievements
+
+    def load_users(self):
+        with self._compact_lock:
+            return self._load_state()[0]
+
+    def load_user_achievements(self, username=None):
+        with self._compact_lock:
+            user_achievements = self._load_state()[1]
+        if username is not None:
+            user_achievements = [ua for ua in user_achievements if ua["username"] == username]
+        return user_achievements
+
+    def save_users(self, users):
+        self.compact(users=users)
+
+    def save_user_achievements(self, user_achievements):
+        self.compact(user_achievements=user_achievements)
+
+    def submit(self, events):
+        logged_at = datetime.now().isoformat()
+        with self._lock:
+            ticket = self.log.submit([{**event, "logged_at": logged_at} for event in events])
+            self._log_events += len(events)
+            if self.compact_events and self._log_events >= self.compact_events:
+                self._wake.set()
+        return ticket
+
+    def wait(self, ticket):
+        self.log.wait(ticket)
+
+    def compact(self, users=None, user_achievements=None):
+        """Fold the log into new snapshots, optionally replacing users or unlocks outright."""
+        replacing = users is not None or user_achievements is not None
+        with self._compact_lock:
+            if os.path.exists(self.segment_path):
+                # Finish a compaction that was interrupted by a crash
+                self._write_snapshots()
+            with self._lock:
+                if self.log.rotate(self.segment_path):
+                    self._log_events = 0
+                if replacing:
+                    # Nothing may be appended between reading the state and replacing it
+                    self._write_snapshots(users, user_achievements)
+                    return
+            self._write_snapshots()
+
+    def _write_snapshots(self, users=None, user_achievements=None):
+        state_users, state_user_achievements = self._load_state()
+        self.users_file.write(state_users if users is None else list(users))
+        self.user_achievements_file.write(state_user_achievements if user_achievements is None else list(user_achievements))
+        if os.path.exists(self.segment_path):
+            with open(self.segment_path, 'rb') as segment, open(self.archive_path, 'ab') as archive:
+                archive.write(segment.read())
+                archive.flush()
+                os.fsync(archive.fileno())
+            os.remove(self.segment_path)
+
+    def _compact_loop(self):
+        while True:
+            self._wake.wait(COMPACT_INTERVAL)
+            self._wake.clear()
+            if self._log_events < self.compact_events and not os.path.exists(self.segment_path):
+                continue
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Event log compaction failed")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_achievements (
+    username TEXT NOT NULL,
+    achievement_id TEXT NOT NULL,
+    unlocked_at TEXT NOT NULL,
+    PRIMARY KEY (username, achievement_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_achievements_achievement_id
+    ON user_achievements (achievement_id);
+-- Committed event batches (JSON), for other processes to apply; NULL events mark a full replace
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    events TEXT
+);
+"""
+
+
+class SQLiteStorage(Storage):
+    """SQLite storage in WAL mode with one connection per thread.
+
+    Every write also records its events in the changes table, so several
+    server processes can share the database and follow each other's changes.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def initialize(self):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def load_users(self):
+        rows = self._connect().execute("SELECT username, created_at FROM users ORDER BY rowid")
+        return [dict(row) for row in rows]
+
+    def load_user_achievements(self, username=None):
+        conn = self._connect()
+        if username is None:
+            rows = conn.execute(
+                "SELECT username, achievement_id, unlocked_at FROM user_achievements ORDER BY rowid"
+            )
+        else:
+            rows = conn.execute(
+                "SELECT username, achievement_id, unlocked_at FROM user_achievements "
+                "WHERE username = ? ORDER BY rowid",
+                (username,)
+            )
+        return [dict(row) for row in rows]
+
+    def get_user(self, username):
+        row = self._connect().execute(
+            "SELECT username, created_at FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save_users(self, users):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                "INSERT INTO users (username, created_at) VALUES (?, ?)",
+                [(u["username"], u["created_at"]) for u in users]
+            )
+            self._record_change(conn, None)
+
+    def save_user_achievements(self, user_achievements):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM user_achievements")
+            conn.executemany(
+                "INSERT OR REPLACE INTO user_achievements (username, achievement_id, unlocked_at) VALUES (?, ?, ?)",
+                [(ua["username"], ua["achievement_id"], ua["unlocked_at"]) for ua in user_achievements]
+            )
+            self._record_change(conn, None)
+
+    def _record_change(self, conn, events):
+        payload = None if events is None else json.dumps(events, ensure_ascii=False, separators=(",", ":"))
+        seq = conn.execute("INSERT INTO changes (events) VALUES (?)", (payload,)).lastrowid
+        if payload is not None:
+            STORAGE_BYTES.inc(len(payload.encode("utf-8")), file=os.path.basename(self.path), direction="write")
+        # Prune old changes every thousand writes
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_RETENTION,))
+        return seq
+
+    def change_seq(self):
+        row = self._connect().execute("SELECT MAX(seq) FROM changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, seq):
+        rows = self._connect().execute(
+            "SELECT seq, events FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+        # Sequence numbers have no gaps, so a jump means the changes were pruned
+        if rows and rows[0]["seq"] != seq + 1:
+            return None
+        STORAGE_BYTES.inc(
+            sum(len(row["events"].encode("utf-8")) for row in rows if row["events"] is not None),
+            file=os.path.basename(self.path), direction="read"
+        )
+        return [(row["seq"], None if row["events"] is None else json.loads(row["events"])) for row in rows]
+
+    def submit(self, events):
+        conn = self._connect()
+        with conn:
+            for event in events:
+                kind = event["type"]
+                if kind == "add_user":
+                    conn.execute(
+                        "INSERT OR IGNORE INTO users (username, created_at) VALUES (?, ?)",
+                        (event["username"], event["created_at"])
+                    )
+                elif kind == "delete_user":
+                    conn.execute("DELETE FROM users WHERE username = ?", (event["username"],))
+                    conn.execute("DELETE FROM user_achievements WHERE username = ?", (event["username"],))
+                elif kind == "unlock":
+                    conn.execute(
+                        "INSERT INTO user_achievements (username, achievement_id, unlocked_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT (username, achievement_id) DO UPDATE SET unlocked_at = excluded.unlocked_at",
+                        (event["username"], event["achievement_id"], event["unlocked_at"])
+                    )
+                elif kind == "lock":
+                    conn.execute(
+                        "DELETE FROM user_achievements WHERE username = ? AND achievement_id = ?",
+                        (event["username"], event["achievement_id"])
+                    )
+                elif kind == "catalog":
+                    # Only recorded as a change, so other workers reload achievements.json too
+                    pass
+                else:
+                    raise ValueError(f"Unknown storage event type: {kind}")
+            return self._record_change(conn, events)
+
+    def import_json(self, users_file=USERS_FILE, user_achievements_file=USER_ACHIEVEMENTS_FILE):
+        """One-shot import of the JSON files into this database."""
+        source = JSONStorage(users_file, user_achievements_file)
+        users = source.load_users()
+        user_achievements = source.load_user_achievements()
+        self.initialize()
+        self.save_users(users)
+        self.save_user_achievements(user_achievements)
+        return len(users), len(user_achievements)
+
+
+def create_storage():
+    """Create the storage backend selected by ACHIEVEMENTS_STORAGE."""
+    backend = os.environ.get("ACHIEVEMENTS_STORAGE", "log").lower()
+    if backend == "log":
+        return EventLogStorage()
+    if backend == "json":
+        return JSONStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("ACHIEVEMENTS_DB", SQLITE_FILE))
+    raise ValueError(f"Unknown ACHIEVEMENTS_STORAGE backend: {backend}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "import-json":
+        print("Usage: python storage.py import-json [database_path]")
+        sys.exit(1)
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("ACHIEVEMENTS_DB", SQLITE_FILE)
+    user_count, unlock_count = SQLiteStorage(db_path).import_json()
+    print(f"Imported {user_count} users and {unlock_count} unlocks into {db_path}")
@@ -0,0 +1,1024 @@
+"""
+Process-resident data store for the achievements API.
+
+Everything is loaded from the catalog file and the storage backend once at
+startup and kept in in-memory indexes. Mutations update the indexes and are
+written through to the storage backend, so request handlers never re-read
+or scan the data files.
+
+Unlocks are kept compactly: usernames and achievement ids are interned to
+small ints, each user's unlocks are one array of packed ints, and who holds
+what is a pair of bitsets (achievements per user, users per achievement), so
+membership tests and holder counts are bit operations.
+
+Reads don't take the lock: every change publishes an immutable StoreView of
+the users, catalog and unlocks, copying the tables the previous view shares
+before changing them (copy on write), and readers use whichever view is
+current. Admin writes therefore never block reads, and a handler reading
+one view sees one version throughout. The copying costs O(users) per write.
+The ordered indexes behind ranking pages, user paging and recent activity
+would cost more, so they are still read under the lock (and the overall
+statistics from a snapshot, see snapshots.py).
+
+With storage shared between processes (SQLite, see storage.py) each worker
+process has its own store and applies the changes other workers commit, in
+commit order, before serving a request and from a background poller.
+
+The catalog is reloaded when achievements.json changes on disk (by hand or
+through the admin catalog endpoints). A reload goes through storage as a
+"catalog" event, so it bumps the data version like any other change and
+reaches the other workers of a multi-worker server.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
+from sortedcontainers import SortedDict, SortedList
+
+from metrics import STORAGE_SECONDS
+from storage import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Unlock times are stored as integer microseconds since the Unix epoch (naive, like the data files)
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MICROSECOND = timedelta(microseconds=1)
+DAY_MICROS = 86400 * 10**6
+
+# Unlock keys pack a user id above an achievement index; time index entries
+# pack the unlock time above the key
+ACHIEVEMENT_BITS = 20
+ACHIEVEMENT_MASK = (1 << ACHIEVEMENT_BITS) - 1
+KEY_BITS = 64
+KEY_MASK = (1 << KEY_BITS) - 1
+
+# Fields per unlock in a user's unlock row: achievement index, unlocked at, position
+ROW_FIELDS = 3
+
+try:
+    popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def popcount(bits):
+        return bin(bits).count("1")
+
+
+def encode_time(value):
+    """Microseconds for an ISO timestamp, and the string itself if formatting them back would not reproduce it."""
+    unlocked_at = datetime.fromisoformat(value)
+    if unlocked_at.tzinfo is not None:
+        unlocked_at = unlocked_at.astimezone(timezone.utc).replace(tzinfo=None)
+    micros = (unlocked_at - EPOCH) // MICROSECOND
+    return micros, (None if unlocked_at.isoformat() == value else value)
+
+
+def decode_time(micros):
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+# The catalog file is meant for hand editing, so it is always written indented
+CATALOG_INDENT = 2
+
+
+def load_catalog(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def catalog_stat(path):
+    """(mtime, size) of the catalog file, to notice changes without reading it."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_catalog(path):
+    """Catalog entries, a hash of the file's content and its catalog_stat()."""
+    stat = catalog_stat(path)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], None, None
+    return json.loads(data), hashlib.sha256(data).hexdigest(), stat
+
+
+class Ranking:
+    """Items ordered by count (descending), ties kept in insertion order.
+
+    Backed by a sorted list, so updates and rank lookups are O(log n).
+    """
+
+    def __init__(self):
+        self._entries = SortedList()
+        # name -> (negated count, tie-break order, name)
+        self._keys = {}
+
+    def set(self, name, count, order):
+        old = self._keys.get(name)
+        if old is not None:
+            self._entries.remove(old)
+        key = (-count, order, name)
+        self._keys[name] = key
+        self._entries.add(key)
+
+    def add_to_count(self, name, delta):
+        neg_count, order, _ = self._keys[name]
+        self.set(name, -neg_count + delta, order)
+
+    def remove(self, name):
+        key = self._keys.pop(name, None)
+        if key is not None:
+            self._entries.remove(key)
+
+    def rank(self, name):
+        """1-based position of name, or 0 if it is not ranked."""
+        key = self._keys.get(name)
+        if key is None:
+            return 0
+        return self._entries.index(key) + 1
+
+    def count(self, name):
+        key = self._keys.get(name)
+        return -key[0] if key is not None else 0
+
+    def order(self, name):
+        """Tie-break order name was ranked with, or None."""
+        key = self._keys.get(name)
+        return key[1] if key is not None else None
+
+    def items(self, start=0, stop=None):
+        """(name, count) pairs in ranking order, optionally only positions start..stop."""
+        return [(name, -neg_count) for neg_count, _, name in self._entries.islice(start, stop)]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class StoreView:
+    """The store's users, catalog and unlocks at one version, read without the lock.
+
+    Every change publishes a new view (DataStore.view()). Writers copy the
+    tables a published view shares before changing them, so a view is never
+    modified and stays consistent for as long as a reader holds it. The
+    records it hands out (user and catalog dicts) are shared too: copy them
+    before adding fields.
+    """
+
+    __slots__ = (
+        "version", "modified_at", "achievements", "catalog_indexes", "achievements_by_id",
+        "users", "normal_unlock_total", "_admin_username", "_admin_bit", "_user_ids", "_user_names",
+        "_achievement_indexes", "_achievement_names", "_user_bits", "_holder_bits", "_unlock_rows", "_raw_times",
+        "_rank_keys", "_rank_buckets"
+    )
+
+    def __init__(self, store):
+        self.version, self.modified_at = store._data_version
+        self.achievements, self.catalog_indexes = store._catalog
+        self.achievements_by_id = store.achievements_by_id
+        self.users = store.users
+        self.normal_unlock_total = store.normal_unlock_total
+        self._admin_username = store.admin_username
+        self._admin_bit = store._admin_bit
+        # Interned ids only grow, so later ones may be missing from this view's tables
+        self._user_ids = store._user_ids
+        self._user_names = store._user_names
+        self._achievement_indexes = store._achievement_indexes
+        self._achievement_names = store._achievement_names
+        self._user_bits = store.user_bits
+        self._holder_bits = store.holder_bits
+        self._unlock_rows = store.unlock_rows
+        self._raw_times = store._raw_times
+        self._rank_keys = store._rank_keys
+        self._rank_buckets = store._rank_buckets
+
+    def has_user(self, username):
+        return username in self.users
+
+    def get_user(self, username):
+        """The user's record, or None."""
+        return self.users.get(username)
+
+    def has_achievement(self, achievement_id):
+        return achievement_id in self.achievements_by_id
+
+    def normal_user_count(self):
+        return len(self.users) - (1 if self._admin_username in self.users else 0)
+
+    def _uid(self, username):
+        uid = self._user_ids.get(username)
+        return uid if uid is not None and uid < len(self._user_bits) else None
+
+    def bits_of(self, username):
+        """Achievement indexes the user holds, as a bitset."""
+        uid = self._uid(username)
+        return 0 if uid is None else self._user_bits[uid]
+
+    def user_achievement_status(self, username):
+        """(achievement, unlocked) for each catalog achievement, in catalog order."""
+        bits = self.bits_of(username)
+        return [(achievement, bool(bits >> index & 1)) for achievement, index in zip(self.achievements, self.catalog_indexes)]
+
+    def unlock_record(self, uid, index, micros):
+        return {
+            "username": self._user_names[uid],
+            "achievement_id": self._achievement_names[index],
+            "unlocked_at": self._raw_times.get(uid << ACHIEVEMENT_BITS | index) or decode_time(micros)
+        }
+
+    def user_unlocks(self, username):
+        """Unlock records of one user, in unlock order."""
+        uid = self._uid(username)
+        row = self._unlock_rows[uid] if uid is not None else None
+        if row is None:
+            return []
+        return [self.unlock_record(uid, row[slot], row[slot + 1]) for slot in range(0, len(row), ROW_FIELDS)]
+
+    def user_unlock_count(self, username):
+        return popcount(self.bits_of(username))
+
+    def unlock_count(self, achievement_id):
+        """Number of non-admin users holding an achievement."""
+        index = self._achievement_indexes.get(achievement_id)
+        if index is None or index >= len(self._holder_bits):
+            return 0
+        return popcount(self._holder_bits[index] & ~self._admin_bit)
+
+    def user_rank(self, username):
+        """1-based leaderboard position of a normal user (like DataStore.user_ranking), or 0 if not ranked."""
+        key = self._rank_keys.get(username)
+        if key is None:
+            return 0
+        count, order = key
+        ahead = sum(len(bucket) for bucket_count, bucket in self._rank_buckets.items() if bucket_count > count)
+        return ahead + self._rank_buckets[count].index(order) + 1
+
+
+class DataStore:
+    def __init__(self, storage, achievements_file, admin_username):
+        self.storage = storage
+        self.achievements_file = achievements_file
+        self.admin_username = admin_username
+        self.lock = threading.RLock()
+        # Bumped after every change, for ETags and response caches
+        self.version = 0
+        self.modified_at = datetime.now(timezone.utc)
+        self._data_version = (self.version, self.modified_at)
+        # username -> (version, modified_at) of the last change to the user's unlocks or
+        # record; users not listed last changed with the catalog (see user_data_version)
+        self.user_versions = {}
+        self._catalog_version = self._data_version
+        # Users changed, and whether the catalog changed, since the last _changed()
+        self._touched_users = set()
+        self._catalog_touched = False
+        # Whether the current view shares the tables, which must then be copied before a change
+        self._published = False
+        # Callables receiving a list of delta events after every change (see events.py)
+        self.listeners = []
+        # Sequence number of the last shared storage change applied
+        self.synced_seq = 0
+        self.load()
+
+    def load(self):
+        """(Re)build all indexes from the catalog file and the storage backend."""
+        with self.lock:
+            # Read before the data, so changes committed while loading are
+            # replayed afterwards (replaying an applied change is harmless)
+            with self._timed("change_seq"):
+                self.synced_seq = self.storage.change_seq()
+            # username -> user record, in registration order
+            with self._timed("load_users"):
+                self.users = {u["username"]: u for u in self.storage.load_users()}
+            # Interned ids: username -> user id and back, achievement id -> index and back.
+            # Ids are never reused, also for users without a record (deleted, or orphan unlocks)
+            self._user_ids = {}
+            self._user_names = []
+            self._achievement_indexes = {}
+            self._achievement_names = []
+            # Bitsets: user id -> achievement indexes held, achievement index -> user ids holding it
+            self.user_bits = []
+            self.holder_bits = []
+            # User id -> array of ROW_FIELDS ints per unlock, in unlock order: achievement
+            # index, unlocked_at microseconds, and position in the overall unlock order
+            self.unlock_rows = []
+            # Unlock key -> original unlocked_at string, for the few that microseconds don't reproduce
+            self._raw_times = {}
+            self._next_position = itertools.count()
+            self.unlock_total = 0
+            self._set_catalog(*read_catalog(self.achievements_file))
+            # Per-user versions start over: everything counts as changed now
+            self._catalog_touched = True
+            self._admin_id = self._user_id(self.admin_username)
+            self._admin_bit = 1 << self._admin_id
+            # Non-admin unlocks as unlocked_at microseconds << KEY_BITS | unlock key
+            self.unlock_times = SortedList()
+            # date -> {achievement_id: non-admin unlocks on that day}
+            self.daily_unlocks = SortedDict()
+            # Sorted and combined once at the end instead of per unlock
+            times, holders = [], {}
+            with self._timed("load_user_achievements"):
+                user_achievements = self.storage.load_user_achievements()
+            for ua in user_achievements:
+                self._index_unlock(ua["username"], ua["achievement_id"], ua["unlocked_at"], times, holders)
+            self.unlock_times = SortedList(times)
+            for index, uids in holders.items():
+                mask = bytearray(len(self._user_names) // 8 + 1)
+                for uid in uids:
+                    mask[uid >> 3] |= 1 << (uid & 7)
+                self.holder_bits[index] = int.from_bytes(mask, "little")
+            self._build_counters()
+            self._changed()
+
+    def _changed(self, deltas=()):
+        # Called under the lock once the in-memory change is complete,
+        # so listeners see deltas in the same order as the changes
+        # Shared storage: the change sequence number, which agrees across workers
+        self.version = self.synced_seq if self.storage.shared else self.version + 1
+        self.modified_at = datetime.now(timezone.utc)
+        # Replaced as one tuple, so data_version() can read it without the lock
+        self._data_version = (self.version, self.modified_at)
+        # Readers switch to the new data with this one assignment
+        self._view = StoreView(self)
+        self._published = True
+        self._shared_buckets = set(self._rank_buckets)
+        if self._catalog_touched:
+            # Every user's view changed; older per-user versions are superseded
+            self._catalog_version = self._data_version
+            self.user_versions = {}
+            self._catalog_touched = False
+        for username in self._touched_users:
+            self.user_versions[username] = self._data_version
+        self._touched_users.clear()
+        if deltas and self.listeners:
+            deltas = [{**delta, "version": self.version} for delta in deltas]
+            for listener in self.listeners:
+                listener(deltas)
+
+    def _catch_up(self):
+        """Apply changes committed to shared storage since the last sync; call under the lock."""
+        if not self.storage.shared:
+            return
+        with self._timed("changes_since"):
+            changes = self.storage.changes_since(self.synced_seq)
+        if changes is None or any(events is None for _, events in changes):
+            # Too far behind, or the data was replaced wholesale: start over
+            self.load()
+            self._changed([{"type": "resync"}])
+            return
+        for seq, events in changes:
+            self.synced_seq = seq
+            self._changed(self._apply(events))
+
+    def refresh_if_stale(self):
+        """Pick up changes other processes made to shared storage."""
+        if not self.storage.shared:
+            return
+        with self._timed("change_seq"):
+            seq = self.storage.change_seq()
+        if seq != self.synced_seq:
+            with self.lock:
+                self._catch_up()
+
+    def start_sync_thread(self, interval):
+        """Poll shared storage in the background, so live update streams see other workers' changes."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh_if_stale()
+                except Exception:
+                    logger.exception("Syncing with shared storage failed")
+
+        threading.Thread(target=run, name="store-sync", daemon=True).start()
+
+    def _timed(self, operation):
+        return STORAGE_SECONDS.time(backend=self.storage.name, operation=operation)
+
+    def _wait(self, ticket):
+        """Block until a submitted write is durable; call without the lock."""
+        with self._timed("wait"):
+            self.storage.wait(ticket)
+
+    def _rank_delta(self, username):
+        return {
+            "type": "rank",
+            "username": username,
+            "rank": self.user_ranking.rank(username),
+            "achievements_count": self.user_ranking.count(username)
+        }
+
+    def _writable(self):
+        """Copy the tables the current view shares before changing them; call under the lock.
+
+        Only the first change after a view is published copies anything, but
+        that copy is O(users): about 1 ms at 20,000 users. The records and
+        unlock rows in the tables are not copied: records are never changed,
+        and rows are replaced instead (see _index_unlock). Rank buckets are
+        copied one at a time, when first changed (see _rank_bucket).
+        """
+        if self._published:
+            self.users = dict(self.users)
+            self.user_bits = list(self.user_bits)
+            self.holder_bits = list(self.holder_bits)
+            self.unlock_rows = list(self.unlock_rows)
+            self._raw_times = dict(self._raw_times)
+            self._rank_keys = dict(self._rank_keys)
+            self._rank_buckets = dict(self._rank_buckets)
+            self._published = False
+
+    def view(self):
+        """The current StoreView; never blocks."""
+        return self._view
+
+    def data_version(self):
+        """(version, modified_at) of the current data; never blocks."""
+        return self._data_version
+
+    def user_data_version(self, username):
+        """(version, modified_at) of the last change to what user_achievement_status(username) returns; never blocks.
+
+        Changes to other users leave it alone, so per-user responses stay cached.
+        """
+        return self.user_versions.get(username) or self._catalog_version
+
+    def _build_counters(self):
+        # Leaderboard of normal users, ties in registration order
+        self._user_order = itertools.count()
+        self.user_ranking = Ranking()
+        # The same leaderboard for views: username -> (count, order), and count -> orders of the users with it
+        self._rank_keys = {}
+        self._rank_buckets = {}
+        self._shared_buckets = set()
+        # Normal users as (registration order, username), and usernames alone for prefix search
+        self.registration = SortedList()
+        self.usernames = SortedList()
+        # (casefolded username, username), for case-insensitive prefix search
+        self.folded_usernames = SortedList()
+        for username in self.users:
+            if not self.is_admin(username):
+                self._rank_new_user(username, popcount(self._bits_of(username)))
+        self._rank_achievements()
+        self.normal_unlock_total = self.unlock_total - popcount(self._bits_of(self.admin_username))
+
+    def _rank_achievements(self):
+        # Catalog achievements by number of non-admin holders, ties in catalog order
+        ranking = Ranking()
+        for order, achievement in enumerate(self.achievements):
+            holders = self.holder_bits[self._achievement_indexes[achievement["id"]]]
+            ranking.set(achievement["id"], popcount(holders & ~self._admin_bit), order)
+        self.achievement_ranking = ranking
+
+    def _set_catalog(self, achievements, content_hash, stat):
+        for achievement in achievements:
+            self._achievement_index(achievement["id"])
+        # (catalog, achievement index of each entry), replaced as one tuple for readers without the lock
+        self._catalog = (achievements, [self._achievement_indexes[a["id"]] for a in achievements])
+        self.achievements = achievements
+        # id -> achievement record
+        self.achievements_by_id = {a["id"]: a for a in achievements}
+        self.catalog_hash = content_hash
+        self._catalog_stat = stat
+
+    def _rank_bucket(self, count):
+        """The orders of users with count unlocks, copied first if the view shares them."""
+        bucket = self._rank_buckets.get(count)
+        if bucket is None:
+            bucket = self._rank_buckets[count] = SortedList()
+        elif count in self._shared_buckets:
+            bucket = self._rank_buckets[count] = bucket.copy()
+            self._shared_buckets.discard(count)
+        return bucket
+
+    def _set_rank_key(self, username, key):
+        old = self._rank_keys.pop(username, None)
+        if old is not None:
+            bucket = self._rank_bucket(old[0])
+            bucket.remove(old[1])
+            if not bucket:
+                # Kept to non-empty buckets, so StoreView.user_rank sums few
+                del self._rank_buckets[old[0]]
+        if key is not None:
+            self._rank_keys[username] = key
+            self._rank_bucket(key[0]).add(key[1])
+
+    def _rank_new_user(self, username, count):
+        order = next(self._user_order)
+        self.user_ranking.set(username, count, order)
+        self._set_rank_key(username, (count, order))
+        self.registration.add((order, username))
+        self.usernames.add(username)
+        self.folded_usernames.add((username.casefold(), username))
+
+    def _unrank_user(self, username):
+        order = self.user_ranking.order(username)
+        if order is not None:
+            self.registration.remove((order, username))
+            self.usernames.remove(username)
+            self.folded_usernames.remove((username.casefold(), username))
+            self.user_ranking.remove(username)
+            self._set_rank_key(username, None)
+
+    def _count_unlock(self, username, achievement_id, delta):
+        if self.is_admin(username):
+            return
+        self.normal_unlock_total += delta
+        if username in self.users:
+            self.user_ranking.add_to_count(username, delta)
+            count, order = self._rank_keys[username]
+            self._set_rank_key(username, (count + delta, order))
+        if achievement_id in self.achievements_by_id:
+            self.achievement_ranking.add_to_count(achievement_id, delta)
+
+    def _user_id(self, username):
+        uid = self._user_ids.get(username)
+        if uid is None:
+            # Names first: views share the interning, and may see the id as soon as it is added
+            uid = len(self._user_names)
+            self._user_names.append(username)
+            self.user_bits.append(0)
+            self.unlock_rows.append(None)
+            self._user_ids[username] = uid
+        return uid
+
+    def _achievement_index(self, achievement_id):
+        index = self._achievement_indexes.get(achievement_id)
+        if index is None:
+            index = len(self._achievement_names)
+            self._achievement_names.append(achievement_id)
+            self.holder_bits.append(0)
+            self._achievement_indexes[achievement_id] = index
+        return index
+
+    def _has_unlock(self, username, achievement_id):
+        uid = self._user_ids.get(username)
+        index = self._achievement_indexes.get(achievement_id)
+        return uid is not None and index is not None and bool(self.user_bits[uid] >> index & 1)
+
+    @staticmethod
+    def _row_slot(row, index):
+        for slot in range(0, len(row), ROW_FIELDS):
+            if row[slot] == index:
+                return slot
+        raise KeyError(index)
+
+    def _index_unlock(self, username, achievement_id, unlocked_at, times=None, holders=None):
+        """Record an unlock; re-unlocking refreshes the time but keeps the unlock's position.
+
+        While loading, times collects the time index entries and holders
+        {achievement index: [user id]} the holder bits, instead of updating
+        unlock_times and holder_bits.
+        """
+        uid = self._user_id(username)
+        index = self._achievement_index(achievement_id)
+        key = uid << ACHIEVEMENT_BITS | index
+        micros, raw = encode_time(unlocked_at)
+        row = self.unlock_rows[uid]
+        if times is None and row is not None:
+            # Views may share the row, so change a copy (rows are only built in place while loading)
+            row = self.unlock_rows[uid] = array("q", row)
+        if self.user_bits[uid] >> index & 1:
+            slot = self._row_slot(row, index)
+            self._unindex_time(key, row[slot + 1])
+            row[slot + 1] = micros
+        else:
+            if row is None:
+                row = self.unlock_rows[uid] = array("q")
+            row.extend((index, micros, next(self._next_position)))
+            self.user_bits[uid] |= 1 << index
+            if holders is not None:
+                holders.setdefault(index, []).append(uid)
+            else:
+                self.holder_bits[index] |= 1 << uid
+            self.unlock_total += 1
+        if raw is not None:
+            self._raw_times[key] = raw
+        else:
+            self._raw_times.pop(key, None)
+        self._index_time(key, micros, times)
+
+    def _unindex_unlock(self, username, achievement_id):
+        """Remove an unlock, returning whether there was one."""
+        if not self._has_unlock(username, achievement_id):
+            return False
+        uid = self._user_ids[username]
+        index = self._achievement_indexes[achievement_id]
+        key = uid << ACHIEVEMENT_BITS | index
+        row = self.unlock_rows[uid]
+        slot = self._row_slot(row, index)
+        self._unindex_time(key, row[slot + 1])
+        # A new row, as views may share this one
+        self.unlock_rows[uid] = row[:slot] + row[slot + ROW_FIELDS:] or None
+        self._raw_times.pop(key, None)
+        self.user_bits[uid] &= ~(1 << index)
+        self.holder_bits[index] &= ~(1 << uid)
+        self.unlock_total -= 1
+        return True
+
+    def _index_time(self, key, micros, times=None):
+        if key >> ACHIEVEMENT_BITS == self._admin_id:
+            return
+        entry = micros << KEY_BITS | key
+        if times is not None:
+            times.append(entry)
+        else:
+            self.unlock_times.add(entry)
+        achievement_id = self._achievement_names[key & ACHIEVEMENT_MASK]
+        day = self.daily_unlocks.setdefault(date.fromordinal(EPOCH_ORDINAL + micros // DAY_MICROS), {})
+        day[achievement_id] = day.get(achievement_id, 0) + 1
+
+    def _unindex_time(self, key, micros):
+        if key >> ACHIEVEMENT_BITS == self._admin_id:
+            return
+        self.unlock_times.remove(micros << KEY_BITS | key)
+        achievement_id = self._achievement_names[key & ACHIEVEMENT_MASK]
+        day_key = date.fromordinal(EPOCH_ORDINAL + micros // DAY_MICROS)
+        day = self.daily_unlocks[day_key]
+        day[achievement_id] -= 1
+        if not day[achievement_id]:
+            del day[achievement_id]
+            if not day:
+                del self.daily_unlocks[day_key]
+
+    def is_admin(self, username):
+        return username == self.admin_username
+
+    # Reads: these use the current view and never block (see StoreView)
+
+    def has_user(self, username):
+        return self._view.has_user(username)
+
+    def get_user(self, username):
+        """The user's record, or None."""
+        return self._view.get_user(username)
+
+    def has_achievement(self, achievement_id):
+        return self._view.has_achievement(achievement_id)
+
+    def normal_user_count(self):
+        return self._view.normal_user_count()
+
+    def user_achievement_status(self, username):
+        """(achievement, unlocked) for each catalog achievement, in catalog order."""
+        return self._view.user_achievement_status(username)
+
+    def user_unlocks(self, username):
+        """Unlock records of one user, in unlock order."""
+        return self._view.user_unlocks(username)
+
+    def user_unlock_count(self, username):
+        return self._view.user_unlock_count(username)
+
+    def unlock_count(self, achievement_id):
+        """Number of non-admin users holding an achievement."""
+        return self._view.unlock_count(achievement_id)
+
+    def user_rank(self, username):
+        """1-based leaderboard position of a normal user, or 0 if not ranked."""
+        return self._view.user_rank(username)
+
+    # Reads of the ordered indexes (rankings, registration and unlock time order), under the lock
+
+    def _bits_of(self, username):
+        uid = self._user_ids.get(username)
+        return 0 if uid is None else self.user_bits[uid]
+
+    def recent_unlocks(self, since):
+        """Non-admin unlock records unlocked after since (a naive datetime), in unlock order."""
+        with self.lock:
+            # Entries for time since itself are below since + 1 microsecond
+            start = ((since - EPOCH) // MICROSECOND + 1) << KEY_BITS
+            unlocks = []
+            for entry in self.unlock_times.irange(start):
+                key = entry & KEY_MASK
+                uid, index = key >> ACHIEVEMENT_BITS, key & ACHIEVEMENT_MASK
+                row = self.unlock_rows[uid]
+                slot = self._row_slot(row, index)
+                unlocks.append((row[slot + 2], uid, index, row[slot + 1]))
+            unlocks.sort()
+            # Under the lock the view has the current data
+            view = self._view
+            return [view.unlock_record(uid, index, micros) for _, uid, index, micros in unlocks]
+
+    def daily_unlock_counts(self, start, end):
+        """{date: {achievement_id: count}} of non-admin unlocks for days start..end, skipping empty days."""
+        with self.lock:
+            return {day: dict(self.daily_unlocks[day]) for day in self.daily_unlocks.irange(start, end)}
+
+    def _prefix_matches(self, prefix, ignore_case=False):
+        if ignore_case:
+            folded = prefix.casefold()
+            return (name for _, name in self.folded_usernames.irange((folded,), (folded + "\U0010ffff",)))
+        return self.usernames.irange(prefix, prefix + "\U0010ffff")
+
+    def users_page(self, offset=0, limit=None, prefix=None, ignore_case=False):
+        """A page of normal user records and the total number matching.
+
+        Without a prefix users are in registration order; with one they are
+        the users whose name starts with it (ignoring case if ignore_case is
+        set), in name order.
+        """
+        stop = None if limit is None else offset + limit
+        with self.lock:
+            if prefix:
+                names = list(self._prefix_matches(prefix, ignore_case))
+                return [self.users[name] for name in names[offset:stop]], len(names)
+            page = [self.users[name] for _, name in self.registration.islice(offset, stop)]
+            return page, len(self.registration)
+
+    def ranked_user_counts(self, offset=0, limit=None, prefix=None):
+        """(username, achievements_count, rank) for normal users, best first, and the total matching.
+
+        offset/limit select a page of the ranking; prefix keeps only users whose
+        name starts with it (ranks stay their overall ranks).
+        """
+        stop = None if limit is None else offset + limit
+        with self.lock:
+            if prefix:
+                ranked = sorted(
+                    (self.user_ranking.rank(name), name) for name in self._prefix_matches(prefix)
+                )
+                return [(name, self.user_ranking.count(name), rank) for rank, name in ranked[offset:stop]], len(ranked)
+            page = self.user_ranking.items(offset, stop)
+            return [(name, count, offset + i + 1) for i, (name, count) in enumerate(page)], len(self.user_ranking)
+
+    def unlock_matrix(self, since=None):
+        """Which catalog achievements each normal user holds, as bitmasks.
+
+        Returns (version, full, catalog, masks, deleted): masks maps usernames
+        to an int whose bit i is set if they hold catalog entry i. Given the
+        version of an earlier call, only users changed since then are in masks
+        and deleted lists the users removed since; a full matrix (full=True)
+        is returned instead if since is None, from before the catalog last
+        changed, or not a version this store has reached.
+        """
+        with self.lock:
+            version = self.version
+            catalog, indexes = self._catalog
+            full = since is None or not self._catalog_version[0] <= since <= version
+            if full:
+                usernames = [name for name in self.users if not self.is_admin(name)]
+                deleted = []
+            else:
+                changed = [name for name, (v, _) in self.user_versions.items() if v > since and not self.is_admin(name)]
+                usernames = [name for name in changed if name in self.users]
+                deleted = [name for name in changed if name not in self.users]
+            if indexes == list(range(len(indexes))):
+                # Catalog entry i is achievement index i (no removed achievements): mask the bits
+                catalog_mask = (1 << len(indexes)) - 1
+                masks = {name: self._bits_of(name) & catalog_mask for name in usernames}
+            else:
+                masks = {}
+                for name in usernames:
+                    bits = self._bits_of(name)
+                    masks[name] = sum(1 << position for position, index in enumerate(indexes) if bits >> index & 1)
+            return version, full, catalog, masks, deleted
+
+    def ranked_achievement_counts(self):
+        """(achievement_id, unlock_count) for the catalog, most popular first."""
+        with self.lock:
+            return self.achievement_ranking.items()
+
+    # Mutations (written through to storage)
+    #
+    # Each mutation submits its storage events while holding the lock, so they
+    # reach storage in the same order as the in-memory changes, and waits for
+    # durability after releasing it so concurrent writes can be group-committed.
+
+    def _write(self, events):
+        """Submit events to storage and apply them to the indexes; call under the lock."""
+        with self._timed("submit"):
+            ticket = self.storage.submit(events)
+        if self.storage.shared:
+            # Applies this change along with any committed before it by other processes
+            self._catch_up()
+        else:
+            self._changed(self._apply(events))
+        return ticket
+
+    def _apply(self, events):
+        """Apply storage events to the indexes, returning the delta events for listeners.
+
+        Like the storage backends, an event whose effect is already in place
+        changes nothing, so replaying events is safe.
+        """
+        self._writable()
+        deltas = []
+        changed_users = {}
+        for event in events:
+            kind, username = event["type"], event.get("username")
+            if kind == "catalog":
+                # The catalog file is the source of truth; the event only says when it changed
+                achievements, content_hash, stat = read_catalog(self.achievements_file)
+                if content_hash == self.catalog_hash:
+                    continue
+                self._set_catalog(achievements, content_hash, stat)
+                self._rank_achievements()
+                self._catalog_touched = True
+                # Everything derived from the catalog changed; clients re-fetch
+                deltas.append({"type": "resync"})
+            elif kind == "add_user":
+                if username in self.users:
+                    continue
+                user = {"username": username, "created_at": event["created_at"]}
+                self.users[username] = user
+                self._touched_users.add(username)
+                if not self.is_admin(username):
+                    self._rank_new_user(username, 0)
+                deltas.append({
+                    "type": "user_added",
+                    **user,
+                    "rank": self.user_ranking.rank(username),
+                    "total_users": len(self.user_ranking)
+                })
+            elif kind == "delete_user":
+                if username not in self.users and not self._bits_of(username):
+                    continue
+                uid = self._user_ids.get(username)
+                row = self.unlock_rows[uid] if uid is not None else None
+                achievement_ids = [self._achievement_names[index] for index in row[::ROW_FIELDS]] if row else []
+                for achievement_id in achievement_ids:
+                    self._unindex_unlock(username, achievement_id)
+                    self._count_unlock(username, achievement_id, -1)
+                self.users.pop(username, None)
+                self._unrank_user(username)
+                self._touched_users.add(username)
+                changed_users.pop(username, None)
+                deltas.append({
+                    "type": "user_deleted",
+                    "username": username,
+                    "total_users": len(self.user_ranking),
+                    "total_unlocks": self.normal_unlock_total,
+                    "unlock_counts": {a: self.achievement_ranking.count(a) for a in achievement_ids}
+                })
+            elif kind in ("unlock", "lock"):
+                achievement_id = event["achievement_id"]
+                if kind == "unlock":
+                    if not self._has_unlock(username, achievement_id):
+                        self._count_unlock(username, achievement_id, 1)
+                    self._index_unlock(username, achievement_id, event["unlocked_at"])
+                elif self._unindex_unlock(username, achievement_id):
+                    self._count_unlock(username, achievement_id, -1)
+                else:
+                    continue
+                changed_users[username] = True
+                self._touched_users.add(username)
+                deltas.append({
+                    **event,
+                    "unlock_count": self.achievement_ranking.count(achievement_id),
+                    "total_unlocks": self.normal_unlock_total
+                })
+        deltas.extend(self._rank_delta(username) for username in changed_users if username in self.users)
+        return deltas
+
+    def add_user(self, username, created_at):
+        """Register a user, returning False if they already exist."""
+        with self.lock:
+            self._catch_up()
+            if username in self.users:
+                return False
+            ticket = self._write([{"type": "add_user", "username": username, "created_at": created_at}])
+        self._wait(ticket)
+        return True
+
+    def delete_user(self, username, keep_last=False):
+        """Delete a user and their unlocks, returning why not if they could not be.
+
+        Returns None once deleted, "user" if there is no such user, or
+        "last_user" if keep_last is set and they are the last normal user.
+        Checked under the lock, so a concurrent change can't slip in between.
+        """
+        with self.lock:
+            self._catch_up()
+            if username not in self.users:
+                return "user"
+            if keep_last and not self.is_admin(username) and len(self.user_ranking) <= 1:
+                return "last_user"
+            ticket = self._write([{"type": "delete_user", "username": username}])
+        self._wait(ticket)
+        return None
+
+    def unlock(self, username, achievement_id, unlocked_at):
+        return self.update_achievements([(username, achievement_id, True)], unlocked_at)[0]
+
+    def lock_achievement(self, username, achievement_id):
+        return self.update_achievements([(username, achievement_id, False)], None)[0]
+
+    def update_achievements(self, updates, unlocked_at):
+        """Apply (username, achievement_id, unlocked) updates with a single storage write.
+
+        Returns one entry per update: None if it was applied, or what was
+        missing ("user" or "achievement"). Checked under the lock, so an update
+        racing the user's deletion is refused rather than left behind.
+        """
+        results = []
+        with self.lock:
+            self._catch_up()
+            events = []
+            for username, achievement_id, unlocked in updates:
+                if username not in self.users:
+                    results.append("user")
+                    continue
+                if achievement_id not in self.achievements_by_id:
+                    results.append("achievement")
+                    continue
+                results.append(None)
+                if unlocked:
+                    events.append({
+                        "type": "unlock",
+                        "username": username,
+                        "achievement_id": achievement_id,
+                        "unlocked_at": unlocked_at
+                    })
+                else:
+                    events.append({"type": "lock", "username": username, "achievement_id": achievement_id})
+            if not events:
+                return results
+            ticket = self._write(events)
+        self._wait(ticket)
+        return results
+
+    # Catalog
+
+    def reload_catalog_if_changed(self, force=False):
+        """Reload the catalog if achievements.json changed, returning whether it did.
+
+        Unless forced, the file is only read when its mtime or size changed,
+        and only a change of content counts.
+        """
+        stat = catalog_stat(self.achievements_file)
+        if not force and stat == self._catalog_stat:
+            return False
+        with self.lock:
+            self._catch_up()
+            # Set first, so an edit that is not valid JSON is reported once rather than at every check
+            self._catalog_stat = stat
+            _, content_hash, _ = read_catalog(self.achievements_file)
+            if content_hash == self.catalog_hash:
+                return False
+            ticket = self._write([{"type": "catalog", "hash": content_hash}])
+        self._wait(ticket)
+        return True
+
+    def start_catalog_watcher(self, interval):
+        """Check achievements.json for changes in the background."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_catalog_if_changed()
+                except Exception:
+                    logger.exception("Reloading the achievement catalog failed")
+
+        threading.Thread(target=run, name="catalog-watcher", daemon=True).start()
+
+    def _edit_catalog(self, edit):
+        """Rewrite achievements.json with edit(entries) and reload it; edit returns False to leave it unchanged."""
+        with self.lock:
+            achievements = load_catalog(self.achievements_file)
+            if edit(achievements) is False:
+                return False
+            write_json_atomic(self.achievements_file, achievements, indent=CATALOG_INDENT)
+        self.reload_catalog_if_changed(force=True)
+        return True
+
+    def add_catalog_achievement(self, achievement):
+        """Append an achievement to the catalog, returning False if its id is taken."""
+        def edit(achievements):
+            if any(a["id"] == achievement["id"] for a in achievements):
+                return False
+            achievements.append(achievement)
+        return self._edit_catalog(edit)
+
+    def update_catalog_achievement(self, achievement_id, fields):
+        """Change fields of a catalog achievement, returning False if there is none with that id."""
+        def edit(achievements):
+            for a in achievements:
+                if a["id"] == achievement_id:
+                    a.update(fields)
+                    return True
+            return False
+        return self._edit_catalog(edit)
+
+    def remove_catalog_achievement(self, achievement_id):
+        """Remove an achievement from the catalog, returning False if there is none with that id.
+
+        Unlocks of it are kept, so re-adding the id restores them.
+        """
+        def edit(achievements):
+            remaining = [a for a in achievements if a["id"] != achievement_id]
+            if len(remaining) == len(achievements):
+                return False
+            achievements[:] = remaining
+        return self._edit_catalog(edit)
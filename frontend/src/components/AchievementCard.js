@@ -1,8 +1,9 @@
 import React from 'react';
 import { useTheme } from '../contexts/ThemeContext';
+import AchievementImage from './AchievementImage';
 
 const AchievementCard = ({ achievement }) => {
-  const { id, name, description, image_url, unlocked } = achievement;
+  const { id, name, description, unlocked } = achievement;
   const { isDark } = useTheme();
 
   return (
@@ -18,9 +19,9 @@ const AchievementCard = ({ achievement }) => {
       <div className="flex flex-col items-center text-center space-y-2">
         {/* Achievement Image */}
         <div className="relative">
-          <img
-            src={image_url}
-            alt={name}
+          <AchievementImage
+            achievement={achievement}
+            sizes="128px"
             className={`w-32 h-32 rounded-full object-cover border-4 transition-all duration-500 ${
               unlocked 
                 ? 'border-green-400 shadow-2xl shadow-green-400/50' 
@@ -0,0 +1,44 @@
+import React from 'react';
+import { API_BASE_URL } from '../services/api';
+
+// "url width" pairs for srcSet; variant URLs are served by the backend
+const toSrcSet = (variants) =>
+  variants.map((variant) => `${API_BASE_URL}${variant.url} ${variant.width}w`).join(', ');
+
+// Achievement badge. When the backend lists resized variants (built by
+// backend/build_images.py) the browser picks the smallest WebP - or PNG -
+// that fits `sizes`; otherwise the full-size image_url is shown.
+const AchievementImage = ({ achievement, sizes, className, onError }) => {
+  const variants = achievement.image_variants;
+
+  if (!variants) {
+    return (
+      <img
+        src={achievement.image_url}
+        alt={achievement.name}
+        className={className}
+        loading="lazy"
+        onError={onError}
+      />
+    );
+  }
+
+  return (
+    // display: contents, so the img is laid out as if the picture element were not there
+    <picture className="contents">
+      <source type="image/webp" srcSet={toSrcSet(variants.webp)} sizes={sizes} />
+      <img
+        src={achievement.image_url}
+        srcSet={toSrcSet(variants.png)}
+        sizes={sizes}
+        alt={achievement.name}
+        className={className}
+        loading="lazy"
+        decoding="async"
+        onError={onError}
+      />
+    </picture>
+  );
+};
+
+export default AchievementImage;
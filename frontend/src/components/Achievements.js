@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getUserAchievements } from '../services/api';
+import { getUserAchievements, subscribeToUpdates } from '../services/api';
 import AchievementCard from './AchievementCard';
 import Header from './Header';
 import { useTheme } from '../contexts/ThemeContext';
@@ -17,6 +17,24 @@ const Achievements = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     fetchAchievements();
   }, [currentUser]);
 
+  // Reflect unlocks and locks for this user as they happen
+  useEffect(() => {
+    const setUnlocked = (unlocked) => (event) => {
+      if (event.username !== currentUser.username) return;
+      setAchievements(prev => prev.map(achievement =>
+        achievement.id === event.achievement_id ? { ...achievement, unlocked } : achievement
+      ));
+    };
+
+    const refresh = () => {
+      getUserAchievements(currentUser.username)
+        .then(data => setAchievements(data.achievements))
+        .catch(() => {});
+    };
+
+    return subscribeToUpdates({ unlock: setUnlocked(true), lock: setUnlocked(false) }, refresh);
+  }, [currentUser]);
+
   const fetchAchievements = async () => {
     setIsLoading(true);
     setError('');
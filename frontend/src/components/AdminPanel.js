@@ -1,19 +1,36 @@
-import React, { useState, useEffect } from 'react';
-import { getAllUsers, getAllAchievements, updateUserAchievement, deleteUser } from '../services/api';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
+import {
+  getAllUsers, getUnlockMatrix, mergeUnlockMatrix, hasUnlock, updateUserAchievement, bulkUpdateAchievements, deleteUser
+} from '../services/api';
 import Header from './Header';
 import { useTheme } from '../contexts/ThemeContext';
+import AchievementImage from './AchievementImage';
+
+// Users fetched per page; "Load more" fetches the next one
+const USERS_PAGE_SIZE = 100;
+
+// Wait for a pause in typing before searching users on the server
+const USER_SEARCH_DELAY_MS = 250;
 
 const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
   const [users, setUsers] = useState([]);
+  // Users matching the search (all users without one)
+  const [usersTotal, setUsersTotal] = useState(0);
+  const [isLoadingMoreUsers, setIsLoadingMoreUsers] = useState(false);
   const [achievements, setAchievements] = useState([]);
   const [selectedUser, setSelectedUser] = useState('');
-  const [userAchievements, setUserAchievements] = useState({});
+  // Every user's unlocks (GET /admin/matrix), so switching users needs no request
+  const [matrix, setMatrix] = useState(null);
   const [message, setMessage] = useState('');
   const [error, setError] = useState('');
   const [userToDelete, setUserToDelete] = useState('');
   const [showDeleteConfirmation, setShowDeleteConfirmation] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [bulkAchievement, setBulkAchievement] = useState('');
+  const [bulkUsers, setBulkUsers] = useState([]);
     const { isDark } = useTheme();
+  // Search the latest users response is for, so a slow response to an older search is dropped
+  const usersSearch = useRef('');
 
   // Helper function to check if user is admin
   const isAdminUser = (username) => {
@@ -24,24 +41,54 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     fetchData();
   }, []);
 
+  // Search users on the server, as only a page of them is loaded
+  const isFirstSearch = useRef(true);
   useEffect(() => {
-    if (selectedUser) {
-      fetchUserAchievements(selectedUser);
+    if (isFirstSearch.current) {
+      isFirstSearch.current = false;
+      return;
     }
-  }, [selectedUser]);
+    const timer = setTimeout(() => {
+      fetchUsers().catch((err) => setError(err.message));
+    }, USER_SEARCH_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Fetch the first page of users matching the search term (by username prefix, ignoring case), replacing the loaded ones
+  const fetchUsers = async () => {
+    const search = searchTerm.trim();
+    usersSearch.current = search;
+    const usersData = await getAllUsers({ limit: USERS_PAGE_SIZE, prefix: search || undefined, ignore_case: true });
+    if (usersSearch.current === search) {
+      setUsers(usersData.users);
+      setUsersTotal(usersData.total);
+    }
+  };
+
+  // Achievement ID -> unlock status for the selected user
+  const userAchievements = useMemo(() => {
+    const achievementMap = {};
+    if (matrix && selectedUser) {
+      const bitmap = matrix.unlocks[selectedUser];
+      matrix.achievements.forEach((achievement, position) => {
+        achievementMap[achievement.id] = hasUnlock(bitmap, position);
+      });
+    }
+    return achievementMap;
+  }, [matrix, selectedUser]);
 
   const fetchData = async () => {
     setIsLoading(true);
     setError('');
 
     try {
-      const [usersData, achievementsData] = await Promise.all([
-        getAllUsers(),
-        getAllAchievements()
+      const [, matrixData] = await Promise.all([
+        fetchUsers(),
+        getUnlockMatrix()
       ]);
       
-      setUsers(usersData.users);
-      setAchievements(achievementsData.achievements);
+      setAchievements(matrixData.achievements);
+      setMatrix(matrixData);
       
       // Set default to empty - user must select a user
       setSelectedUser('');
@@ -52,20 +99,37 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     }
   };
 
-  const fetchUserAchievements = async (username) => {
+  const loadMoreUsers = async () => {
+    setIsLoadingMoreUsers(true);
+
     try {
-      const response = await fetch(`http://localhost:8000/achievements/${username}`);
-      const data = await response.json();
-      
-      // Create a map of achievement ID to unlock status
-      const achievementMap = {};
-      data.achievements.forEach(achievement => {
-        achievementMap[achievement.id] = achievement.unlocked;
+      const search = usersSearch.current;
+      const usersData = await getAllUsers({ offset: users.length, limit: USERS_PAGE_SIZE, prefix: search || undefined, ignore_case: true });
+      if (usersSearch.current !== search) {
+        return;
+      }
+      setUsers(prev => {
+        const loaded = new Set(prev.map((user) => user.username));
+        return [...prev, ...usersData.users.filter((user) => !loaded.has(user.username))];
       });
-      
-      setUserAchievements(achievementMap);
+      setUsersTotal(usersData.total);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setIsLoadingMoreUsers(false);
+    }
+  };
+
+  // Fetch only the users changed since our copy of the matrix (all of it if the catalog changed)
+  const refreshMatrix = async () => {
+    try {
+      const update = await getUnlockMatrix(matrix?.version);
+      if (update.full) {
+        setAchievements(update.achievements);
+      }
+      setMatrix(prev => mergeUnlockMatrix(prev, update));
     } catch (err) {
-      console.error('Failed to fetch user achievements:', err);
+      console.error('Failed to refresh unlock matrix:', err);
     }
   };
 
@@ -88,12 +152,7 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     try {
       const currentStatus = userAchievements[achievementId] || false;
       await updateUserAchievement(selectedUser, achievementId, !currentStatus);
-      
-      // Update local state
-      setUserAchievements(prev => ({
-        ...prev,
-        [achievementId]: !currentStatus
-      }));
+      await refreshMatrix();
       
       setMessage(`Achievement ${!currentStatus ? 'unlocked' : 'locked'} for ${selectedUser}`);
     } catch (err) {
@@ -103,6 +162,43 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     }
   };
 
+  const toggleBulkUser = (username) => {
+    setBulkUsers(prev =>
+      prev.includes(username) ? prev.filter(u => u !== username) : [...prev, username]
+    );
+  };
+
+  const handleBulkUpdate = async (unlocked) => {
+    if (!bulkAchievement || bulkUsers.length === 0) {
+      setError('Please select an achievement and at least one user');
+      return;
+    }
+
+    setIsLoading(true);
+    setError('');
+    setMessage('');
+
+    try {
+      const result = await bulkUpdateAchievements({
+        grants: [{ achievement_id: bulkAchievement, usernames: bulkUsers, unlocked }]
+      });
+
+      // Keep the grid in sync
+      await refreshMatrix();
+
+      const failures = result.results.filter(r => r.status_code !== 200);
+      if (failures.length > 0) {
+        setError(failures.map(r => `${r.username}: ${r.detail}`).join(', '));
+      }
+      setMessage(result.message);
+      setBulkUsers([]);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const handleDeleteUser = async () => {
     if (!userToDelete) {
       setError('Please select a user to delete');
@@ -161,9 +257,11 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     achievement.description.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
-  const filteredUsers = users.filter(user =>
-    user.username.toLowerCase().includes(searchTerm.toLowerCase())
-  );
+  // Already filtered by the server (see fetchUsers)
+  const filteredUsers = users;
+
+  // Normal users in the matrix: the overall count, whatever the search
+  const totalUsers = matrix ? Object.keys(matrix.unlocks).length : usersTotal;
 
   if (isLoading && users.length === 0) {
     return (
@@ -251,6 +349,17 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
                   </option>
                 ))}
               </select>
+              {users.length < usersTotal && (
+                <button
+                  onClick={loadMoreUsers}
+                  disabled={isLoadingMoreUsers}
+                  className={`mt-2 text-sm font-medium transition-colors duration-200 disabled:opacity-50 ${
+                    isDark ? 'text-blue-300 hover:text-blue-200' : 'text-blue-600 hover:text-blue-800'
+                  }`}
+                >
+                  {isLoadingMoreUsers ? 'Loading...' : `Load more users (${users.length} of ${usersTotal})`}
+                </button>
+              )}
             </div>
             
             <div className="flex-1">
@@ -261,7 +370,7 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
               </label>
               <input
                 type="text"
-                placeholder="Search achievements..."
+                placeholder="Search achievements, or users by the start of their name..."
                 value={searchTerm}
                 onChange={(e) => setSearchTerm(e.target.value)}
                 className={`w-full px-4 py-3 rounded-lg border placeholder-gray-400 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all duration-300 ${
@@ -315,12 +424,18 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
 
                     {/* Achievement Image */}
                     <div className="flex justify-center mb-4">
-                      <img
-                        src={achievement.image_url}
-                        alt={achievement.name}
+                      <AchievementImage
+                        achievement={achievement}
+                        sizes="64px"
                         className="w-16 h-16 object-contain"
                         onError={(e) => {
-                          e.target.src = '/images/default-achievement.png';
+                          const image = e.target;
+                          // With a srcset (ours or the <picture>'s WebP source), src alone is never used
+                          image.closest('picture')?.querySelectorAll('source').forEach((source) => source.removeAttribute('srcset'));
+                          image.removeAttribute('srcset');
+                          if (!image.src.endsWith('/images/default-achievement.png')) {
+                            image.src = '/images/default-achievement.png';
+                          }
                         }}
                       />
                     </div>
@@ -393,6 +508,77 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
           </div>
         )}
 
+        {/* Bulk Grant Section */}
+        <div className={`rounded-xl p-6 mb-8 transition-all duration-300 ${
+          isDark 
+            ? 'glass-effect' 
+            : 'bg-white/80 backdrop-blur-sm border border-white/20'
+        }`}>
+          <h2 className={`text-2xl font-bold mb-6 transition-colors duration-300 ${
+            isDark ? 'text-white' : 'text-gray-900'
+          }`}>Grant Achievement to Multiple Users</h2>
+
+          <div className="mb-6">
+            <label className={`block text-sm font-medium mb-2 transition-colors duration-300 ${
+              isDark ? 'text-gray-200' : 'text-gray-700'
+            }`}>
+              Select Achievement
+            </label>
+            <select
+              value={bulkAchievement}
+              onChange={(e) => setBulkAchievement(e.target.value)}
+              className={`w-full px-4 py-3 rounded-lg border focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-all duration-300 ${
+                isDark 
+                  ? 'bg-white/10 border-white/20 text-white' 
+                  : 'bg-white/80 border-gray-300 text-gray-900'
+              }`}
+            >
+              <option value="">Select an achievement...</option>
+              {achievements.map((achievement) => (
+                <option key={achievement.id} value={achievement.id}>
+                  {achievement.name}
+                </option>
+              ))}
+            </select>
+          </div>
+
+          <div className="grid grid-cols-2 md:grid-cols-4 gap-2 max-h-48 overflow-y-auto mb-6">
+            {filteredUsers.map((user) => (
+              <label
+                key={user.username}
+                className={`flex items-center space-x-2 text-sm transition-colors duration-300 ${
+                  isDark ? 'text-gray-200' : 'text-gray-700'
+                }`}
+                dir="auto"
+              >
+                <input
+                  type="checkbox"
+                  checked={bulkUsers.includes(user.username)}
+                  onChange={() => toggleBulkUser(user.username)}
+                />
+                <span>{user.username}</span>
+              </label>
+            ))}
+          </div>
+
+          <div className="flex space-x-4">
+            <button
+              onClick={() => handleBulkUpdate(true)}
+              disabled={isLoading || !bulkAchievement || bulkUsers.length === 0}
+              className="flex-1 bg-green-500 hover:bg-green-600 text-white font-semibold py-3 px-4 rounded-lg transition-colors duration-200 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              Grant to {bulkUsers.length} Users
+            </button>
+            <button
+              onClick={() => handleBulkUpdate(false)}
+              disabled={isLoading || !bulkAchievement || bulkUsers.length === 0}
+              className="flex-1 bg-red-500 hover:bg-red-600 text-white font-semibold py-3 px-4 rounded-lg transition-colors duration-200 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              Revoke from {bulkUsers.length} Users
+            </button>
+          </div>
+        </div>
+
         {/* Delete User Section */}
         <div className={`rounded-xl p-6 transition-all duration-300 ${
           isDark 
@@ -484,7 +670,7 @@ const AdminPanel = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
           }`}>
             <div className={`text-3xl font-bold mb-2 transition-colors duration-300 ${
               isDark ? 'text-white' : 'text-gray-900'
-            }`}>{users.length}</div>
+            }`}>{totalUsers}</div>
             <div className={`transition-colors duration-300 ${
               isDark ? 'text-gray-300' : 'text-gray-600'
             }`}>Total Users</div>
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { getAllAchievements } from '../services/api';
 import Header from './Header';
 import { useTheme } from '../contexts/ThemeContext';
+import AchievementImage from './AchievementImage';
 
 const AllAchievements = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
   const [achievements, setAchievements] = useState([]);
@@ -199,13 +200,14 @@ const AllAchievements = ({ currentUser, onLogout, isLoading, setIsLoading }) =>
                     <div className={`absolute inset-0 bg-gradient-to-br from-purple-400/20 to-blue-400/20 opacity-0 group-hover:opacity-100 transition-opacity duration-500`}></div>
                     
                     {achievement.image_url ? (
-                      <img 
-                        src={achievement.image_url} 
-                        alt={achievement.name}
+                      <AchievementImage
+                        achievement={achievement}
+                        sizes="144px"
                         className="relative w-full h-full object-cover transition-transform duration-500 group-hover:scale-125"
                         onError={(e) => {
-                          e.target.style.display = 'none';
-                          e.target.nextSibling.style.display = 'flex';
+                          const image = e.target.closest('picture') || e.target;
+                          image.style.display = 'none';
+                          image.nextSibling.style.display = 'flex';
                         }}
                       />
                     ) : null}
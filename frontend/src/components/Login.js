@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { loginUser, getAllUsers } from '../services/api';
+import { loginUser, getUser } from '../services/api';
 import { useTheme } from '../contexts/ThemeContext';
 
 const Login = ({ onLogin, isLoading, setIsLoading }) => {
@@ -32,11 +32,9 @@ const Login = ({ onLogin, isLoading, setIsLoading }) => {
       }
 
       // Check if user already exists (for non-admin users)
-      const usersResponse = await getAllUsers();
-      const existingUsers = usersResponse.users;
-      const userExists = existingUsers.some(user => user.username === username.trim());
+      const existingUser = await getUser(username.trim());
       
-      if (!userExists) {
+      if (!existingUser) {
         // Show confirmation dialog for new user
         setPendingUser(username.trim());
         setShowConfirmation(true);
@@ -1,13 +1,59 @@
-import React, { useState, useEffect } from 'react';
-import { getStatistics, getUserStatistics } from '../services/api';
+import React, { useState, useEffect, useRef } from 'react';
+import { getStatistics, getUserStatistics, subscribeToUpdates } from '../services/api';
 import Header from './Header';
 import { useTheme } from '../contexts/ThemeContext';
 
+const round2 = (value) => Math.round(value * 100) / 100;
+
+// Ranking rows fetched per page; more are loaded as the list is scrolled
+const RANKINGS_PAGE_SIZE = 50;
+
+// The page doesn't show the recent activity list, so don't download it
+const statisticsParams = (rankingsLimit) => ({ rankings_limit: rankingsLimit, activity_limit: 0 });
+
+const withRankingsTotal = (statistics, total) => ({
+  ...statistics,
+  pagination: {
+    ...statistics.pagination,
+    user_rankings: { ...statistics.pagination.user_rankings, total }
+  }
+});
+
+// Apply new unlock counts and totals to a statistics payload, recomputing
+// the derived percentages and popularity order the way the backend does
+const withUpdatedTotals = (statistics, unlockCounts, totalUsers, totalUnlocks) => {
+  const achievementPopularity = statistics.achievement_popularity
+    .map((achievement) => {
+      const unlockCount = unlockCounts[achievement.id] ?? achievement.unlock_count;
+      return {
+        ...achievement,
+        unlock_count: unlockCount,
+        popularity_percentage: totalUsers > 0 ? round2((unlockCount / totalUsers) * 100) : 0
+      };
+    })
+    .sort((a, b) => b.unlock_count - a.unlock_count);
+
+  return {
+    ...statistics,
+    overall_stats: {
+      ...statistics.overall_stats,
+      total_users: totalUsers,
+      total_unlocks: totalUnlocks,
+      average_achievements_per_user: totalUsers > 0 ? round2(totalUnlocks / totalUsers) : 0
+    },
+    achievement_popularity: achievementPopularity,
+    most_popular_achievement: achievementPopularity[0] || null,
+    least_popular_achievement: achievementPopularity[achievementPopularity.length - 1] || null
+  };
+};
+
 const Statistics = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
   const [statistics, setStatistics] = useState(null);
   const [userStats, setUserStats] = useState(null);
   const [error, setError] = useState('');
   const [activeTab, setActiveTab] = useState('rankings');
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const rankingsEndRef = useRef(null);
     const { isDark } = useTheme();
 
   // Helper function to check if user is admin
@@ -19,13 +65,106 @@ const Statistics = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     fetchStatistics();
   }, [currentUser]);
 
+  // Patch the loaded statistics from live update events instead of polling
+  useEffect(() => {
+    const isCurrentUser = (username) => !isAdminUser(currentUser) && username === currentUser.username;
+
+    const refreshUserStats = () => {
+      if (!isAdminUser(currentUser)) {
+        getUserStatistics(currentUser.username).then(setUserStats).catch(() => {});
+      }
+    };
+
+    const handleUnlockChange = (event) => {
+      setStatistics(prev => prev && withUpdatedTotals(
+        prev,
+        { [event.achievement_id]: event.unlock_count },
+        prev.overall_stats.total_users,
+        event.total_unlocks
+      ));
+      if (isCurrentUser(event.username)) {
+        refreshUserStats();
+      }
+    };
+
+    const handleRankChange = (event) => {
+      setStatistics(prev => {
+        if (!prev) return prev;
+        const userRankings = prev.user_rankings
+          .map((user) => user.username === event.username
+            ? {
+                ...user,
+                achievements_count: event.achievements_count,
+                completion_percentage: user.total_achievements > 0
+                  ? round2((event.achievements_count / user.total_achievements) * 100)
+                  : 0
+              }
+            : user)
+          .sort((a, b) => b.achievements_count - a.achievements_count);
+        return { ...prev, user_rankings: userRankings };
+      });
+      if (isCurrentUser(event.username)) {
+        setUserStats(prev => prev && { ...prev, rank: event.rank });
+      }
+    };
+
+    const handleUserAdded = (event) => {
+      setStatistics(prev => prev && withUpdatedTotals(
+        withRankingsTotal({
+          ...prev,
+          // New users rank last, so they only show once the list is scrolled to the end
+          user_rankings: prev.user_rankings.length < prev.pagination.user_rankings.total
+            ? prev.user_rankings
+            : [...prev.user_rankings, {
+                username: event.username,
+                rank: event.rank,
+                achievements_count: 0,
+                total_achievements: prev.overall_stats.total_achievements,
+                completion_percentage: 0
+              }]
+        }, event.total_users),
+        {},
+        event.total_users,
+        prev.overall_stats.total_unlocks
+      ));
+      refreshUserStats();
+    };
+
+    const handleUserDeleted = (event) => {
+      setStatistics(prev => prev && withUpdatedTotals(
+        withRankingsTotal(
+          { ...prev, user_rankings: prev.user_rankings.filter((user) => user.username !== event.username) },
+          event.total_users
+        ),
+        event.unlock_counts,
+        event.total_users,
+        event.total_unlocks
+      ));
+      refreshUserStats();
+    };
+
+    const refreshAll = () => {
+      // Starts again from the first ranking page; scrolling loads the rest
+      getStatistics(statisticsParams(RANKINGS_PAGE_SIZE)).then(setStatistics).catch(() => {});
+      refreshUserStats();
+    };
+
+    return subscribeToUpdates({
+      unlock: handleUnlockChange,
+      lock: handleUnlockChange,
+      rank: handleRankChange,
+      user_added: handleUserAdded,
+      user_deleted: handleUserDeleted
+    }, refreshAll);
+  }, [currentUser]);
+
   const fetchStatistics = async () => {
     setIsLoading(true);
     setError('');
 
     try {
       const [statsData, userStatsData] = await Promise.all([
-        getStatistics(),
+        getStatistics(statisticsParams(RANKINGS_PAGE_SIZE)),
         // Only fetch user statistics if not admin
         isAdminUser(currentUser) ? Promise.resolve(null) : getUserStatistics(currentUser.username)
       ]);
@@ -38,6 +177,47 @@ const Statistics = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
     }
   };
 
+  const hasMoreRankings = statistics
+    ? statistics.user_rankings.length < statistics.pagination.user_rankings.total
+    : false;
+
+  const loadMoreRankings = async () => {
+    if (isLoadingMore || !hasMoreRankings) return;
+    setIsLoadingMore(true);
+
+    try {
+      const page = await getStatistics({
+        rankings_offset: statistics.user_rankings.length,
+        rankings_limit: RANKINGS_PAGE_SIZE,
+        activity_limit: 0
+      });
+      setStatistics(prev => {
+        const loaded = new Set(prev.user_rankings.map((user) => user.username));
+        return withRankingsTotal(
+          { ...prev, user_rankings: [...prev.user_rankings, ...page.user_rankings.filter((user) => !loaded.has(user.username))] },
+          page.pagination.user_rankings.total
+        );
+      });
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  // Infinite scroll: load the next ranking page when the end of the list comes into view
+  useEffect(() => {
+    const sentinel = rankingsEndRef.current;
+    if (!sentinel || !hasMoreRankings) return undefined;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) {
+        loadMoreRankings();
+      }
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  });
+
   if (isLoading) {
     return (
       <div className={`min-h-screen flex items-center justify-center transition-colors duration-300 ${
@@ -201,6 +381,15 @@ const Statistics = ({ currentUser, onLogout, isLoading, setIsLoading }) => {
                   </div>
                 ))}
               </div>
+              {hasMoreRankings && (
+                <div ref={rankingsEndRef} className={`text-center text-sm pt-4 transition-colors duration-300 ${
+                  isDark ? 'text-gray-400' : 'text-gray-600'
+                }`}>
+                  {isLoadingMore
+                    ? 'Loading more users...'
+                    : `Showing ${user_rankings.length} of ${statistics.pagination.user_rankings.total} users`}
+                </div>
+              )}
             </div>
           </div>
         )}
@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = 'http://localhost:8000';
+export const API_BASE_URL = 'http://localhost:8000';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -36,15 +36,29 @@ export const getAllAchievements = async () => {
   }
 };
 
-export const getAllUsers = async () => {
+// params: offset, limit, prefix (username prefix)
+export const getAllUsers = async (params = {}) => {
   try {
-    const response = await api.get('/users');
+    const response = await api.get('/users', { params });
     return response.data;
   } catch (error) {
     throw new Error(error.response?.data?.detail || 'Failed to fetch users');
   }
 };
 
+// One user's record, or null if no user has this name
+export const getUser = async (username) => {
+  try {
+    const response = await api.get(`/users/${encodeURIComponent(username)}`);
+    return response.data;
+  } catch (error) {
+    if (error.response?.status === 404) {
+      return null;
+    }
+    throw new Error(error.response?.data?.detail || 'Failed to fetch user');
+  }
+};
+
 export const updateUserAchievement = async (username, achievementId, unlocked) => {
   try {
     const response = await api.post('/admin/update-achievement', {
@@ -58,6 +72,15 @@ export const updateUserAchievement = async (username, achievementId, unlocked) =
   }
 };
 
+export const bulkUpdateAchievements = async ({ updates = [], grants = [] }) => {
+  try {
+    const response = await api.post('/admin/bulk-update-achievements', { updates, grants });
+    return response.data;
+  } catch (error) {
+    throw new Error(error.response?.data?.detail || 'Failed to update achievements');
+  }
+};
+
 export const deleteUser = async (username) => {
   try {
     const response = await api.delete(`/admin/delete-user/${username}`);
@@ -67,9 +90,37 @@ export const deleteUser = async (username) => {
   }
 };
 
-export const getStatistics = async () => {
+// Every user's unlocks as hex bitmaps over `achievements`; pass the version of
+// an earlier matrix as since to get only what changed (see mergeUnlockMatrix)
+export const getUnlockMatrix = async (since) => {
+  try {
+    const response = await api.get('/admin/matrix', { params: since ? { since } : {} });
+    return response.data;
+  } catch (error) {
+    throw new Error(error.response?.data?.detail || 'Failed to fetch unlock matrix');
+  }
+};
+
+// Apply a /admin/matrix response to the matrix it was requested against
+export const mergeUnlockMatrix = (matrix, update) => {
+  if (update.full || !matrix) {
+    return update;
+  }
+  const unlocks = { ...matrix.unlocks, ...update.unlocks };
+  update.deleted.forEach((username) => delete unlocks[username]);
+  return { ...matrix, version: update.version, unlocks };
+};
+
+// Whether bit `position` of a hex bitmap is set
+export const hasUnlock = (bitmap, position) => {
+  const digit = bitmap ? bitmap[bitmap.length - 1 - (position >> 2)] : undefined;
+  return digit !== undefined && ((parseInt(digit, 16) >> (position & 3)) & 1) === 1;
+};
+
+// params: rankings_offset, rankings_limit, prefix, activity_offset, activity_limit
+export const getStatistics = async (params = {}) => {
   try {
-    const response = await api.get('/statistics');
+    const response = await api.get('/statistics', { params });
     return response.data;
   } catch (error) {
     throw new Error(error.response?.data?.detail || 'Failed to fetch statistics');
@@ -85,4 +136,33 @@ export const getUserStatistics = async (username) => {
   }
 };
 
+// Live updates pushed by the server (GET /events, server-sent events).
+// handlers maps event types (unlock, lock, rank, user_added, user_deleted)
+// to callbacks receiving the event data. onResync is called when events may
+// have been missed (reconnect or the client fell behind) and state should be
+// re-fetched. Returns a function that closes the stream.
+const LIVE_EVENT_TYPES = ['unlock', 'lock', 'rank', 'user_added', 'user_deleted'];
+
+export const subscribeToUpdates = (handlers, onResync) => {
+  const source = new EventSource(`${API_BASE_URL}/events`);
+  let connectedBefore = false;
+
+  source.onopen = () => {
+    if (connectedBefore && onResync) {
+      onResync();
+    }
+    connectedBefore = true;
+  };
+
+  LIVE_EVENT_TYPES.forEach((type) => {
+    if (handlers[type]) {
+      source.addEventListener(type, (e) => handlers[type](JSON.parse(e.data)));
+    }
+  });
+
+  source.addEventListener('resync', () => onResync && onResync());
+
+  return () => source.close();
+};
+
 export default api; 
\ No newline at end of file
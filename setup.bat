@@ -10,6 +10,8 @@ if %errorlevel% neq 0 (
     pause
     exit /b 1
 )
+rem Optional: resized achievement images (needs Pillow)
+pip install Pillow && python build_images.py || echo Skipped building resized achievement images
 cd ..
 
 echo.
@@ -9,6 +9,12 @@ if ($LASTEXITCODE -ne 0) {
     Read-Host "Press Enter to continue"
     exit 1
 }
+# Optional: resized achievement images (needs Pillow)
+pip install Pillow
+if ($LASTEXITCODE -eq 0) { python build_images.py }
+if ($LASTEXITCODE -ne 0) {
+    Write-Host "Skipped building resized achievement images" -ForegroundColor Yellow
+}
 Set-Location ..
 
 Write-Host ""
@@ -29,6 +29,8 @@ python3 -m venv venv
 source venv/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
+# Optional: resized achievement images (needs Pillow)
+pip install Pillow && python build_images.py || echo "⚠️  Skipped building resized achievement images"
 cd ..
 
 # Install Node.js dependencies for frontend
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for the bulk achievement update endpoint
+"""
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+def test_bulk_update():
+    """Grant one achievement to several users and revoke it again in bulk"""
+    
+    print("1. Getting users and achievements...")
+    users = requests.get(f"{BASE_URL}/users").json()["users"]
+    achievements = requests.get(f"{BASE_URL}/achievements").json()["achievements"]
+    if not users or not achievements:
+        print("No users or achievements to test with. Please create some users first.")
+        return
+    
+    usernames = [user["username"] for user in users[:5]]
+    achievement_id = achievements[0]["id"]
+    
+    print(f"\n2. Granting {achievement_id} to {len(usernames)} users (plus two invalid items)...")
+    response = requests.post(f"{BASE_URL}/admin/bulk-update-achievements", json={
+        "updates": [{"username": "admin", "achievement_id": achievement_id, "unlocked": True}],
+        "grants": [{"achievement_id": achievement_id, "usernames": usernames + ["no_such_user_xyz"]}]
+    })
+    assert response.status_code == 200, f"Bulk update failed: {response.status_code} - {response.text}"
+    data = response.json()
+    print(f"✅ {data['message']}")
+    assert data["applied"] == len(usernames), "All valid users should be updated"
+    assert [r["status_code"] for r in data["results"]] == [403] + [200] * len(usernames) + [404]
+    
+    for username in usernames:
+        user_achievements = requests.get(f"{BASE_URL}/achievements/{username}").json()["achievements"]
+        assert any(a["id"] == achievement_id and a["unlocked"] for a in user_achievements)
+    print("✅ Achievement unlocked for every user")
+    
+    print(f"\n3. Revoking {achievement_id} from the same users...")
+    response = requests.post(f"{BASE_URL}/admin/bulk-update-achievements", json={
+        "grants": [{"achievement_id": achievement_id, "usernames": usernames, "unlocked": False}]
+    })
+    assert response.status_code == 200
+    for username in usernames:
+        user_achievements = requests.get(f"{BASE_URL}/achievements/{username}").json()["achievements"]
+        assert not any(a["id"] == achievement_id and a["unlocked"] for a in user_achievements)
+    print("✅ Achievement locked again for every user")
+
+if __name__ == "__main__":
+    test_bulk_update()